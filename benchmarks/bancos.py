@@ -0,0 +1,152 @@
+"""
+Roda a suíte de testes e o benchmark de transferências em cada banco e registra os tempos.
+
+Para o PostgreSQL é iniciado um servidor descartável (setup/postgres_testes.py),
+apontado aos testes por TESTES_DATABASE_URL; no SQLite os testes rodam com
+TESTES_POSTGRES=False. Se o servidor não puder ser iniciado (binários ausentes,
+execução como root), o banco é pulado com o motivo e só o SQLite é medido. Os testes de concorrência (locks de linha do select_for_update)
+só rodam no PostgreSQL; no SQLite aparecem como pulados.
+
+Para cada banco são registrados o tempo total da suíte, o tempo de cada teste
+de concorrência e o throughput das transferências por motor. Com --saida, o
+resultado é acrescentado ao JSONL e comparado com a execução anterior do mesmo
+banco, para que regressões nos caminhos com lock apareçam.
+
+Uso:
+    python benchmarks/bancos.py
+    python benchmarks/bancos.py --bancos postgresql --threads 8 --saida bancos.jsonl
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+from contextlib import ExitStack
+from comum import BASE_DIR
+from setup.postgres_testes import PostgresIndisponivel, postgres_temporario
+
+MODULO_CONCORRENCIA = 'carteira.tests.test_concorrencia'
+
+
+def rodar_testes(ambiente):
+    """Roda a suíte com pytest e retorna a duração total e a de cada teste (relatório JUnit)"""
+    with tempfile.TemporaryDirectory() as diretorio:
+        relatorio = os.path.join(diretorio, 'junit.xml')
+        inicio = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, '-m', 'pytest', '-q', '--create-db', '-p', 'no:cacheprovider',
+             f'--junitxml={relatorio}', 'carteira'],
+            cwd=BASE_DIR, env=ambiente, capture_output=True, text=True
+        )
+        duracao = time.perf_counter() - inicio
+        if not os.path.exists(relatorio):
+            raise RuntimeError(f"pytest não gerou o relatório:\n{processo.stdout}\n{processo.stderr}")
+        casos = ElementTree.parse(relatorio).getroot().iter('testcase')
+
+    testes, falhas, pulados = {}, [], 0
+    for caso in casos:
+        nome = f"{caso.get('classname')}.{caso.get('name')}"
+        if caso.find('skipped') is not None:
+            pulados += 1
+            continue
+        testes[nome] = float(caso.get('time'))
+        if caso.find('failure') is not None or caso.find('error') is not None:
+            falhas.append(nome)
+    return {
+        'suite_s': duracao,
+        'testes': len(testes),
+        'falhas': falhas,
+        'pulados': pulados,
+        'concorrencia_s': {nome: s for nome, s in testes.items() if nome.startswith(MODULO_CONCORRENCIA)},
+        'mais_lentos_s': dict(sorted(testes.items(), key=lambda item: item[1], reverse=True)[:10]),
+    }
+
+
+def rodar_transferencias(ambiente, args):
+    with tempfile.TemporaryDirectory() as diretorio:
+        saida = os.path.join(diretorio, 'transferencias.jsonl')
+        subprocess.run(
+            [sys.executable, os.path.join(BASE_DIR, 'benchmarks', 'transferencias.py'),
+             '--transferencias', str(args.transferencias), '--threads', str(args.threads),
+             '--motores', *args.motores, '--saida', saida],
+            cwd=BASE_DIR, env=ambiente, capture_output=True, text=True, check=True
+        )
+        with open(saida, encoding='utf-8') as arquivo:
+            return json.loads(arquivo.read().splitlines()[-1])['resultados']
+
+
+def execucao_anterior(caminho, banco):
+    """Último registro do banco no JSONL, ou None"""
+    if not caminho or not os.path.exists(caminho):
+        return None
+    anterior = None
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            if registro.get('banco') == banco and not registro.get('pulado'):
+                anterior = registro
+    return anterior
+
+
+def variacao(atual, anterior):
+    return f" ({(atual / anterior - 1) * 100:+.0f}%)" if anterior else ''
+
+
+def imprimir(registro, anterior):
+    anterior = anterior or {}
+    print(f"\n{registro['banco']}")
+    if registro.get('pulado'):
+        print(f"  pulado: {registro['motivo']}")
+        return
+    print(f"  suíte {registro['suite_s']:8.2f} s{variacao(registro['suite_s'], anterior.get('suite_s'))}   "
+          f"{registro['testes']} testes, {len(registro['falhas'])} falhas, {registro['pulados']} pulados")
+    for nome in registro['falhas']:
+        print(f"    FALHOU {nome}")
+    for nome, segundos in registro['concorrencia_s'].items():
+        print(f"    {nome.rsplit('.', 1)[-1]:<50} {segundos:7.3f} s"
+              f"{variacao(segundos, anterior.get('concorrencia_s', {}).get(nome))}")
+    for motor, resumo in registro['transferencias'].items():
+        ops_anterior = anterior.get('transferencias', {}).get(motor, {}).get('ops_por_s')
+        print(f"  transferências {motor:<8} {resumo['ops_por_s']:9.0f} ops/s{variacao(resumo['ops_por_s'], ops_anterior)}"
+              f"   p99 {resumo['p99_ms']:7.2f} ms   erros {resumo['erros']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara testes e transferências entre SQLite e PostgreSQL")
+    parser.add_argument('--bancos', nargs='+', choices=['sqlite', 'postgresql'], default=['sqlite', 'postgresql'])
+    parser.add_argument('--transferencias', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--motores', nargs='+', default=['banco', 'lote'])
+    parser.add_argument('--saida', help="Arquivo JSONL onde o resultado de cada banco é acrescentado")
+    args = parser.parse_args()
+
+    sucesso = True
+    for banco in args.bancos:
+        registro = {'data': time.strftime('%Y-%m-%dT%H:%M:%S'), 'banco': banco}
+        ambiente = {key: valor for key, valor in os.environ.items() if key != 'TESTES_DATABASE_URL'}
+        ambiente['TESTES_POSTGRES'] = 'False'  # Sem URL, os testes ficam no SQLite em vez de iniciar outro servidor
+        with ExitStack() as pilha:
+            if banco == 'postgresql':
+                try:
+                    ambiente['TESTES_DATABASE_URL'] = pilha.enter_context(postgres_temporario())
+                except PostgresIndisponivel as erro:
+                    registro.update(pulado=True, motivo=f"PostgreSQL indisponível: {erro}")
+            if not registro.get('pulado'):
+                registro.update(rodar_testes(ambiente))
+                registro['transferencias'] = rodar_transferencias(ambiente, args)
+                sucesso = sucesso and not registro['falhas']
+
+        imprimir(registro, execucao_anterior(args.saida, banco))
+        if args.saida:
+            with open(args.saida, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(json.dumps(registro) + '\n')
+
+    sys.exit(0 if sucesso else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Funções compartilhadas pelos benchmarks que usam o banco"""
+
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))  # Para importar setup e carteira de qualquer diretório
+
+
+def configurar_django(settings_padrao='setup.test_settings'):
+    """
+    Configura o Django e cria um banco de teste descartável (arquivo temporário no SQLite).
+
+    Com TESTES_DATABASE_URL definida, setup.test_settings usa esse banco (ex.: o
+    PostgreSQL descartável de setup/postgres_testes.py) e o banco de teste é criado nele. Sem
+    ela o benchmark fica no SQLite: o PostgreSQL descartável que os testes iniciam
+    sozinhos só é usado com TESTES_POSTGRES=True.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_padrao)
+    os.environ.setdefault('TESTES_POSTGRES', 'False')
+
+    import django
+    from django.conf import settings
+
+    banco = settings.DATABASES['default']
+    if banco['ENGINE'] == 'django.db.backends.sqlite3':
+        # Arquivo em vez de memória, para que threads diferentes vejam os mesmos dados
+        banco['TEST'] = {'NAME': os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')}
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return connection
+
+
+def destruir_banco(connection):
+    connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+def criar_usuarios(quantidade, saldo='1000000.00', prefixo='bench'):
+    """Cria usuários com carteira em lote e retorna a lista de usuários"""
+    from decimal import Decimal
+    from django.contrib.auth.models import User
+    from carteira.models import Carteira
+
+    usuarios = User.objects.bulk_create(
+        [User(username=f'{prefixo}{indice}', password='!') for indice in range(quantidade)]
+    )
+    Carteira.objects.bulk_create([Carteira(usuario=usuario, saldo=Decimal(saldo)) for usuario in usuarios])
+    return usuarios
+
+
+def resumir(latencias_s, duracao_s):
+    """Throughput e percentis de latência (ms) de uma série de operações"""
+    ordenadas = sorted(latencias_s)
+    return {
+        'operacoes': len(ordenadas),
+        'ops_por_s': len(ordenadas) / duracao_s if duracao_s else 0,
+        'p50_ms': statistics.median(ordenadas) * 1000,
+        'p99_ms': ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.99))] * 1000,
+    }
@@ -0,0 +1,112 @@
+"""
+Benchmark de inicialização dos workers.
+
+Para cada perfil de settings, em processos Python novos:
+  1. mede o tempo até a primeira resposta (import do Django, get_wsgi_application
+     e uma primeira requisição WSGI que não acessa o banco);
+  2. roda o mesmo boot com `python -X importtime` e agrupa o tempo de import
+     por pacote de topo, para mostrar onde o boot é gasto.
+
+As variáveis de ambiente exigidas por setup/settings.py (SECRET_KEY, DB_*,
+ALLOWED_HOSTS) precisam estar definidas, mas nenhuma conexão com o banco é aberta.
+
+Uso:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --perfis setup.settings setup.settings_api --repeticoes 10
+    python benchmarks/startup.py --saida startup.jsonl  # acrescenta o resultado para acompanhar a evolução
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Executado no processo filho: boot da aplicação + primeira requisição, com os tempos em JSON no stdout
+CODIGO_BOOT = """
+import io, json, os, sys, time
+inicio = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[1]
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+boot = time.perf_counter()
+
+from django.conf import settings
+host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/carteiras/', 'QUERY_STRING': '',
+    'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+}
+status = []
+b''.join(application(environ, lambda s, h, e=None: status.append(s)))
+fim = time.perf_counter()
+print(json.dumps({'boot_ms': (boot - inicio) * 1000, 'primeira_resposta_ms': (fim - inicio) * 1000, 'status': status[0]}))
+"""
+
+
+def executar_boot(perfil, importtime=False):
+    comando = [sys.executable]
+    if importtime:
+        comando += ['-X', 'importtime']
+    comando += ['-c', CODIGO_BOOT, perfil]
+    processo = subprocess.run(comando, cwd=BASE_DIR, capture_output=True, text=True)
+    if processo.returncode != 0:
+        sys.exit(f"Falha ao iniciar a aplicação com {perfil}:\n{processo.stderr}")
+    return json.loads(processo.stdout.strip().splitlines()[-1]), processo.stderr
+
+
+def agrupar_importtime(stderr):
+    """Soma o tempo próprio (self) de cada módulo importado por pacote de topo, em ms"""
+    por_pacote = defaultdict(float)
+    for linha in stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, _, modulo = linha[len('import time:'):].split('|')
+        por_pacote[modulo.strip().split('.')[0]] += int(proprio) / 1000
+    return por_pacote
+
+
+def medir_perfil(perfil, repeticoes):
+    amostras = [executar_boot(perfil)[0] for _ in range(repeticoes)]
+    _, stderr = executar_boot(perfil, importtime=True)
+    por_pacote = agrupar_importtime(stderr)
+    return {
+        'perfil': perfil,
+        'status': amostras[0]['status'],
+        'boot_ms': statistics.median(a['boot_ms'] for a in amostras),
+        'primeira_resposta_ms': statistics.median(a['primeira_resposta_ms'] for a in amostras),
+        'import_total_ms': sum(por_pacote.values()),
+        'import_por_pacote_ms': dict(sorted(por_pacote.items(), key=lambda item: -item[1])[:10]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de boot e de primeira resposta dos workers")
+    parser.add_argument('--perfis', nargs='+', default=['setup.settings', 'setup.settings_api'])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--saida', help="Arquivo JSONL onde o resultado é acrescentado")
+    args = parser.parse_args()
+
+    resultados = [medir_perfil(perfil, args.repeticoes) for perfil in args.perfis]
+
+    for resultado in resultados:
+        print(f"\n{resultado['perfil']} ({resultado['status']})")
+        print(f"  boot (mediana):              {resultado['boot_ms']:8.1f} ms")
+        print(f"  primeira resposta (mediana): {resultado['primeira_resposta_ms']:8.1f} ms")
+        print(f"  import total (-X importtime): {resultado['import_total_ms']:7.1f} ms")
+        for pacote, ms in resultado['import_por_pacote_ms'].items():
+            print(f"    {pacote:<30} {ms:8.1f} ms")
+
+    if args.saida:
+        with open(args.saida, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps({'data': time.strftime('%Y-%m-%dT%H:%M:%S'), 'resultados': resultados}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
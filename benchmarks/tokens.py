@@ -0,0 +1,110 @@
+"""
+Benchmark dos endpoints de token: login (/api/token/), rotação do refresh
+(/api/token/refresh/) e recusa de um refresh já revogado.
+
+O login é dominado pelo custo do hash da senha. Cada valor de --iteracoes é
+medido com as senhas gravadas naquele custo, o que mostra quanto um custo menor
+(SENHA_ITERACOES) alivia a CPU em rajadas de login. As views são chamadas
+direto, sem o servidor HTTP.
+
+Uso:
+    python benchmarks/tokens.py --logins 200 --iteracoes 870000 260000
+    python benchmarks/tokens.py --threads 4
+"""
+
+import argparse
+import threading
+import time
+from comum import configurar_django, criar_usuarios, destruir_banco, resumir
+
+SENHA = 'senha-benchmark-123'
+
+
+def medir(chamada, quantidade, threads):
+    """Executa chamada(indice) `quantidade` vezes dividida entre as threads; retorna o resumo e os erros"""
+    from django.db import connection
+
+    latencias = []
+    erros = []
+
+    def trabalhador(indices):
+        for indice in indices:
+            inicio = time.perf_counter()
+            codigo = chamada(indice)
+            latencias.append(time.perf_counter() - inicio)
+            if codigo != 200:
+                erros.append(codigo)
+        connection.close()
+
+    grupo = [threading.Thread(target=trabalhador, args=(range(t, quantidade, threads),)) for t in range(threads)]
+    inicio = time.perf_counter()
+    for thread in grupo:
+        thread.start()
+    for thread in grupo:
+        thread.join()
+    return resumir(latencias, time.perf_counter() - inicio), len(erros)
+
+
+def executar(usuarios, logins, threads):
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+    fabrica = APIRequestFactory()
+    login = TokenObtainPairView.as_view()
+    refresh = TokenRefreshView.as_view()
+    tokens = [None] * logins
+    revogados = [None] * logins
+
+    def fazer_login(indice):
+        request = fabrica.post('/api/token/', {'username': usuarios[indice % len(usuarios)].username,
+                                               'password': SENHA}, format='json')
+        response = login(request)
+        tokens[indice] = response.data.get('refresh')
+        return response.status_code
+
+    def rotacionar(indice):
+        response = refresh(fabrica.post('/api/token/refresh/', {'refresh': tokens[indice]}, format='json'))
+        revogados[indice] = tokens[indice]
+        return response.status_code
+
+    def reutilizar_revogado(indice):
+        response = refresh(fabrica.post('/api/token/refresh/', {'refresh': revogados[indice]}, format='json'))
+        return 200 if response.status_code == 401 else response.status_code  # A recusa é o resultado esperado
+
+    return {
+        'login': medir(fazer_login, logins, threads),
+        'refresh': medir(rotacionar, logins, threads),
+        'revogado': medir(reutilizar_revogado, logins, threads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede login, rotação e recusa de tokens JWT")
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--iteracoes', type=int, nargs='+', default=[870000, 260000])
+    args = parser.parse_args()
+
+    connection = configurar_django()
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+
+    usuarios = criar_usuarios(args.usuarios)
+    try:
+        print(f"{args.logins} logins, {args.usuarios} usuários, {args.threads} thread(s), banco: {connection.vendor}")
+        for iteracoes in args.iteracoes:
+            with override_settings(SENHA_ITERACOES=iteracoes):
+                User.objects.filter(pk__in=[u.pk for u in usuarios]).update(password=make_password(SENHA))
+                resultados = executar(usuarios, args.logins, args.threads)
+            print(f"  {iteracoes} iterações")
+            for nome, (resumo, erros) in resultados.items():
+                print(f"    {nome:<10} {resumo['ops_por_s']:9.0f} ops/s   p50 {resumo['p50_ms']:7.2f} ms   "
+                      f"p99 {resumo['p99_ms']:7.2f} ms   erros {erros}")
+    finally:
+        destruir_banco(connection)
+
+
+if __name__ == '__main__':
+    main()
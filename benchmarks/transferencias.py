@@ -0,0 +1,122 @@
+"""
+Benchmark de transferências por motor: caminho padrão (select_for_update),
+livro-razão em memória e group commit em lote.
+
+Todas as variantes passam pela mesma view (CarteiraViewSet.transferencia) com
+autenticação forçada, então a diferença medida é a do motor. Ao final de cada
+motor é medido o tempo de encerrá-lo (no livro-razão, gravar no banco o que
+ficou pendente).
+
+Por padrão usa setup.test_settings (SQLite em arquivo temporário); para medir
+contra o PostgreSQL, defina TESTES_DATABASE_URL ou use benchmarks/bancos.py, que
+inicia um PostgreSQL descartável e compara os bancos.
+No SQLite, com mais de uma thread o caminho padrão falha com "database is locked"
+(não há locks de linha); essas falhas aparecem na coluna de erros.
+
+Uso:
+    python benchmarks/transferencias.py --transferencias 5000 --carteiras 100 --threads 4
+    python benchmarks/transferencias.py --motores banco lote --threads 16
+    python benchmarks/transferencias.py --saida transferencias.jsonl  # acrescenta o resultado em JSONL
+"""
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from comum import configurar_django, criar_usuarios, destruir_banco, resumir
+
+
+def executar(usuarios, transferencias, threads):
+    from django.db import connection
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from carteira.views import CarteiraViewSet
+
+    view = CarteiraViewSet.as_view({'post': 'transferencia'})
+    fabrica = APIRequestFactory()
+    latencias = []
+    erros = []
+
+    def trabalhador(quantidade, semente):
+        aleatorio = random.Random(semente)
+        for _ in range(quantidade):
+            remetente, destinatario = aleatorio.sample(usuarios, 2)
+            request = fabrica.post(
+                '/api/carteiras/transferencia/',
+                {'destinatario_username': destinatario.username, 'valor': '1.00'},
+                format='json'
+            )
+            force_authenticate(request, user=remetente)
+            inicio = time.perf_counter()
+            try:
+                codigo = view(request).status_code
+            except Exception as erro:  # Ex.: "database is locked" no SQLite com várias threads
+                codigo = type(erro).__name__
+            latencias.append(time.perf_counter() - inicio)
+            if codigo != 200:
+                erros.append(codigo)
+        connection.close()
+
+    por_thread = transferencias // threads
+    grupo = [threading.Thread(target=trabalhador, args=(por_thread, indice)) for indice in range(threads)]
+    inicio = time.perf_counter()
+    for thread in grupo:
+        thread.start()
+    for thread in grupo:
+        thread.join()
+    return resumir(latencias, time.perf_counter() - inicio), len(erros)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os motores de depósitos e transferências")
+    parser.add_argument('--transferencias', type=int, default=2000)
+    parser.add_argument('--carteiras', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--motores', nargs='+', default=['banco', 'livro_razao', 'lote'])
+    parser.add_argument('--saida', help="Arquivo JSONL onde o resultado é acrescentado")
+    args = parser.parse_args()
+
+    connection = configurar_django()
+    from django.test import override_settings
+    from carteira.motores import encerrar_motores
+
+    usuarios = criar_usuarios(args.carteiras)
+    diretorio = tempfile.mkdtemp()
+    configuracoes = {
+        'banco': {'CARTEIRA_MOTOR': ''},
+        'livro_razao': {
+            'CARTEIRA_MOTOR': 'livro_razao',
+            'CARTEIRA_LIVRO_RAZAO': {'DIRETORIO': diretorio, 'INTERVALO_DESCARGA': 0.05},
+        },
+        'lote': {'CARTEIRA_MOTOR': 'lote'},
+    }
+    resultados = {}
+    try:
+        print(f"{args.transferencias} transferências, {args.carteiras} carteiras, {args.threads} thread(s), "
+              f"banco: {connection.vendor}")
+        for nome in args.motores:
+            with override_settings(**configuracoes[nome]):
+                resumo, erros = executar(usuarios, args.transferencias, args.threads)
+                inicio = time.perf_counter()
+                encerrar_motores()
+                encerramento_ms = (time.perf_counter() - inicio) * 1000
+            resultados[nome] = dict(resumo, erros=erros, encerramento_ms=encerramento_ms)
+            print(f"  {nome:<12} {resumo['ops_por_s']:9.0f} ops/s   p50 {resumo['p50_ms']:7.2f} ms   "
+                  f"p99 {resumo['p99_ms']:7.2f} ms   erros {erros}   encerramento {encerramento_ms:.1f} ms")
+    finally:
+        shutil.rmtree(diretorio)
+        destruir_banco(connection)
+
+    if args.saida:
+        with open(args.saida, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps({
+                'data': time.strftime('%Y-%m-%dT%H:%M:%S'), 'banco': connection.vendor,
+                'transferencias': args.transferencias, 'carteiras': args.carteiras, 'threads': args.threads,
+                'resultados': resultados,
+            }) + '\n')
+
+
+if __name__ == '__main__':
+    main()
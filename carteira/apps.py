@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CarteiraConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'carteira'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,151 @@
+"""
+Cache em processo da resolução username -> (usuario_id, carteira_id) das transferências.
+
+Os mesmos destinatários (ex.: lojistas) aparecem em boa parte das
+transferências; com o cache a view pula a consulta ao usuário e trava as duas
+carteiras direto pela chave primária. Cada processo tem o próprio cache, limitado
+em TAMANHO_MAXIMO entradas (LRU) e TTL segundos. Exclusões e renomeações de
+usuários feitas neste processo invalidam a entrada pelos sinais (signals.py); as
+feitas em outro processo são detectadas por travar_carteiras(), que confere o
+username da carteira travada, ou expiram pelo TTL. Os motores alternativos
+(lote, livro-razão) não conferem o username, então com eles a view resolve o
+destinatário sempre no banco, por consultar_destinatario().
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db.models import Q
+from .exceptions import RemetenteSemCarteira
+from .models import Carteira
+from .perfil import travar
+
+# Valores usados quando a chave não está presente em settings.CARTEIRA_DESTINATARIOS
+PADROES = {
+    'TAMANHO_MAXIMO': 1024,  # Entradas por processo
+    'TTL': 300,  # Segundos até uma entrada ser consultada novamente no banco
+}
+
+
+def config(chave):
+    return getattr(settings, 'CARTEIRA_DESTINATARIOS', {}).get(chave, PADROES[chave])
+
+
+class CacheDestinatarios:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # username -> (usuario_id, carteira_id, expira_em)
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, username):
+        """Retorna (usuario_id, carteira_id) ou None se o username não estiver em cache ou tiver expirado"""
+        with self._lock:
+            entrada = self._entradas.get(username)
+            if entrada is not None and entrada[2] > time.monotonic():
+                self._entradas.move_to_end(username)
+                self.acertos += 1
+                return entrada[:2]
+            if entrada is not None:
+                del self._entradas[username]
+            self.faltas += 1
+            return None
+
+    def guardar(self, username, usuario_id, carteira_id):
+        with self._lock:
+            self._entradas[username] = (usuario_id, carteira_id, time.monotonic() + config('TTL'))
+            self._entradas.move_to_end(username)
+            while len(self._entradas) > config('TAMANHO_MAXIMO'):
+                self._entradas.popitem(last=False)  # Remove a entrada usada há mais tempo
+
+    def invalidar(self, username=None, usuario_id=None):
+        """Remove a entrada pelo username e/ou todas as entradas que apontam para o usuário"""
+        with self._lock:
+            self._entradas.pop(username, None)
+            if usuario_id is not None:
+                for chave in [chave for chave, entrada in self._entradas.items() if entrada[0] == usuario_id]:
+                    del self._entradas[chave]
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.acertos = self.faltas = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                'entradas': len(self._entradas),
+                'tamanho_maximo': config('TAMANHO_MAXIMO'),
+                'ttl': config('TTL'),
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+
+cache_destinatarios = CacheDestinatarios()
+
+
+def consultar_destinatario(username):
+    """Retorna (usuario_id, carteira_id) do destinatário direto do banco, sem passar pelo cache"""
+    return Carteira.objects.values_list('usuario_id', 'pk').get(usuario__username=username)
+
+
+def resolver_destinatario(username):
+    """
+    Retorna (usuario_id, carteira_id) do destinatário, do cache ou do banco.
+
+    Levanta Carteira.DoesNotExist se o usuário não existir ou não tiver carteira.
+    """
+    resolvido = cache_destinatarios.obter(username)
+    if resolvido is None:
+        resolvido = consultar_destinatario(username)
+        cache_destinatarios.guardar(username, *resolvido)
+    return resolvido
+
+
+def travar_carteiras(remetente, username, destinatario_id, carteira_id):
+    """
+    Trava as carteiras do remetente e do destinatário, uma consulta por carteira, em ordem de id.
+
+    Recebe o destinatário já resolvido por resolver_destinatario() e deve ser
+    chamada dentro de transaction.atomic(). Antes de qualquer lock, uma consulta
+    busca a carteira do remetente pelo id do usuário (fora do cache) e confere a
+    entrada do destinatário; se ela estiver desatualizada (usuário excluído ou
+    renomeado em outro processo), é descartada e a resolução é refeita no banco.
+    Só então as duas carteiras são travadas pela chave primária em ordem fixa,
+    sem nenhum lock anterior fora dessa ordem; em consultas separadas, o monitor
+    de locks atribui a cada carteira só a própria espera. O dono e o username
+    das carteiras travadas são conferidos de novo. Retorna
+    (carteira_remetente, carteira_destinatario); levanta RemetenteSemCarteira se
+    o remetente não tiver carteira e Carteira.DoesNotExist se o destinatário não
+    existir mais.
+    """
+    encontradas = {
+        usuario_id: (pk, nome)
+        for pk, usuario_id, nome in Carteira.objects.filter(Q(usuario_id=remetente.pk) | Q(pk=carteira_id))
+        .values_list('pk', 'usuario_id', 'usuario__username')
+    }
+    if remetente.pk not in encontradas:
+        raise RemetenteSemCarteira()
+    if encontradas.get(destinatario_id) != (carteira_id, username):
+        cache_destinatarios.invalidar(username=username)
+        destinatario_id, carteira_id = resolver_destinatario(username)
+
+    remetente_carteira_id = encontradas[remetente.pk][0]
+    carteiras = {}
+    for pk in sorted({remetente_carteira_id, carteira_id}):  # Mesma ordem de locks em A->B e B->A, sem deadlock
+        for carteira in travar(
+            Carteira.objects.select_for_update(of=('self',)).select_related('usuario').filter(pk=pk)
+        ):
+            carteiras[carteira.usuario_id] = carteira
+    if remetente.pk not in carteiras:
+        raise RemetenteSemCarteira()
+    destinatario = carteiras.get(destinatario_id)
+    if destinatario is None or destinatario.usuario.username != username:
+        # Alterado entre a conferência e o lock: sem nova tentativa, que travaria carteiras fora de ordem
+        cache_destinatarios.invalidar(username=username)
+        raise Carteira.DoesNotExist("Carteira não encontrada")
+    return carteiras[remetente.pk], destinatario
@@ -0,0 +1,77 @@
+from decimal import Decimal, InvalidOperation
+from django import forms
+from django.core import exceptions, validators
+from django.db import models
+from django.utils.functional import cached_property
+
+CENTAVO = Decimal('0.01')
+
+# Maior quantidade de centavos que cabe em um BIGINT
+MAXIMO_CENTAVOS = 9223372036854775807
+VALOR_MAXIMO = Decimal(MAXIMO_CENTAVOS).scaleb(-2)
+
+# Dígitos aceitos nos valores da API: 16 inteiros + 2 decimais, sempre dentro de MAXIMO_CENTAVOS
+MAX_DIGITOS = 18
+
+
+def para_centavos(valor):
+    """Converte um valor em reais (Decimal, str ou int) para um inteiro de centavos"""
+    return int(Decimal(valor).quantize(CENTAVO) * 100)
+
+
+def cabe_no_limite(centavos, acrescimo):
+    """Se somar `acrescimo` a um saldo ou total em centavos ainda cabe em um BIGINT"""
+    return centavos + acrescimo <= MAXIMO_CENTAVOS
+
+
+def de_centavos(centavos):
+    """Converte um inteiro de centavos para Decimal com duas casas"""
+    return Decimal(centavos).scaleb(-2)
+
+
+# Campo monetário: armazenado como BIGINT de centavos, exposto no Python como Decimal
+class CentavosField(models.BigIntegerField):
+    description = "Valor monetário armazenado em centavos"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return de_centavos(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENTAVO)
+        except InvalidOperation:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'],
+                code='invalid',
+                params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return para_centavos(value)
+
+    @cached_property
+    def validators(self):
+        # Os limites do BIGINT valem para os centavos, não para o valor em reais
+        return [
+            *self.default_validators,
+            *self._validators,
+            validators.MinValueValidator(-VALOR_MAXIMO),
+            validators.MaxValueValidator(VALOR_MAXIMO),
+        ]
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'max_digits': MAX_DIGITOS,
+            'decimal_places': 2,
+            'min_value': -VALOR_MAXIMO,
+            'max_value': VALOR_MAXIMO,
+            **kwargs,
+        })
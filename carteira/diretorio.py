@@ -0,0 +1,43 @@
+"""
+Diretório de usuários para o autocomplete de destinatários.
+
+A busca é por prefixo do username, sem diferenciar maiúsculas, e usa no
+PostgreSQL o índice UPPER(username) text_pattern_ops criado pela migração
+0006. Cada página já serializada fica em cache pela URL completa (prefixo,
+cursor e tamanho). Qualquer alteração em usuários troca a versão das chaves no
+cache padrão, que sem CACHES configurado é local a cada processo: no worker que
+gravou o usuário ele aparece na próxima busca, nos demais em até CACHE_TIMEOUT
+segundos. Com um cache compartilhado (ex.: Redis) em CACHES, a troca de versão
+vale para todos os workers.
+"""
+
+import hashlib
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+CACHE_TIMEOUT = 60  # Segundos; também é o atraso máximo de um cadastro nos outros processos
+_CHAVE_VERSAO = 'diretorio_usuarios:versao'
+
+
+def consultar_usuarios(busca=''):
+    """Usuários que não são superusuários, com apenas id e username"""
+    usuarios = User.objects.filter(is_superuser=False)
+    if busca:
+        usuarios = usuarios.filter(username__istartswith=busca)
+    return usuarios.values('id', 'username')
+
+
+def obter_pagina(url, montar):
+    """Retorna a página em cache para a URL ou a monta com montar() e guarda"""
+    versao = cache.get_or_set(_CHAVE_VERSAO, time.time_ns, timeout=None)
+    chave = f'diretorio_usuarios:{versao}:{hashlib.md5(url.encode()).hexdigest()}'
+    pagina = cache.get(chave)
+    if pagina is None:
+        pagina = montar()
+        cache.set(chave, pagina, CACHE_TIMEOUT)
+    return pagina
+
+
+def invalidar_diretorio_usuarios():
+    cache.set(_CHAVE_VERSAO, time.time_ns(), timeout=None)
@@ -0,0 +1,21 @@
+# Exceções dos motores de operações financeiras (livro-razão em memória e afins) e do orçamento de consultas
+
+
+class SaldoInsuficiente(Exception):
+    """A carteira de origem não tem saldo para a operação"""
+
+
+class RemetenteSemCarteira(Exception):
+    """O usuário que envia a transferência não tem carteira"""
+
+
+class LimiteSaldoExcedido(Exception):
+    """O saldo ou o total de entradas da carteira de destino passaria do máximo que cabe em um BIGINT"""
+
+
+class LogCheio(Exception):
+    """Os dois segmentos do log de escrita antecipada têm operações ainda não gravadas no banco"""
+
+
+class OrcamentoExcedido(AssertionError):
+    """Uma requisição ou bloco executou mais comandos SQL que o orçamento declarado"""
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2IteracoesConfiguraveis(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 com o custo definido em settings.SENHA_ITERACOES.
+
+    Mantém o nome de algoritmo do hasher padrão do Django, então os hashes
+    existentes continuam válidos. Quando o custo muda, o Django regrava o hash
+    com o novo custo no próximo login bem-sucedido (must_update).
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'SENHA_ITERACOES', PBKDF2PasswordHasher.iterations)
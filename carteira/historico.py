@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Case, DateField, ExpressionWrapper, F, Q, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber, Trunc
+from django.utils import timezone
+from .dinheiro import CentavosField
+from .models import Carteira, Transacao
+
+# Agrupamentos aceitos pelo endpoint e o "kind" correspondente do Trunc
+AGRUPAMENTOS = {
+    'dia': 'day',
+    'semana': 'week',
+    'mes': 'month',
+}
+
+# Datas aceitas no intervalo: os limites viram datetimes com fuso (e o fim ganha um dia), o que estoura
+# o calendário do Python nos extremos; o intervalo padrão de 30 dias também precisa caber
+DATA_MINIMA = date.min + timedelta(days=32)
+DATA_MAXIMA = date.max - timedelta(days=2)
+
+CACHE_TIMEOUT = 60 * 60  # Uma nova transação muda a chave, o timeout só limpa as entradas que sobraram
+
+
+def _versao(usuario):
+    """
+    Versão do histórico do usuário, lida da carteira e usada para compor a chave do cache.
+
+    Toda gravação de transação altera os contadores e o atualizado_em da carteira
+    na mesma transação do banco, então a versão muda para todos os processos ao
+    mesmo tempo. O cache padrão é local a cada processo e não serviria para
+    propagar uma invalidação entre os workers.
+    """
+    estado = Carteira.objects.filter(usuario=usuario).values_list(
+        'pk', 'qtd_transacoes', 'total_entradas', 'total_saidas', 'atualizado_em'
+    ).first()
+    if estado is None:
+        return 'sem-carteira'
+    carteira_id, qtd_transacoes, entradas, saidas, atualizado_em = estado
+    return f'{carteira_id}:{qtd_transacoes}:{entradas}:{saidas}:{atualizado_em.isoformat()}'
+
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, datetime.min.time()))
+
+
+def _variacao(usuario):
+    """Efeito de cada transação no saldo do usuário: depósitos e transferências recebidas somam, enviadas subtraem"""
+    return Case(
+        When(tipo_transacao='DEPOSITO', then=F('valor')),
+        When(remetente=usuario, then=F('valor') * Value(-1)),
+        default=F('valor'),
+        output_field=CentavosField(),
+    )
+
+
+def calcular_serie_saldo(usuario, inicio, fim, agrupamento):
+    """
+    Calcula o saldo acumulado por período entre inicio e fim (datas inclusivas).
+
+    Todo o cálculo é feito no banco com window functions: o saldo acumulado após
+    cada transação parte do saldo anterior ao início do intervalo, a variação é
+    somada por período e apenas a última linha de cada período é mantida.
+    Apenas períodos com movimentação são retornados, então a resposta cresce com
+    o número de períodos movimentados e não com o tamanho do intervalo.
+    """
+    transacoes = Transacao.objects.filter(Q(remetente=usuario) | Q(destinatario=usuario))
+    variacao = _variacao(usuario)
+    inicio_dt = _inicio_do_dia(inicio)
+    fim_dt = _inicio_do_dia(fim + timedelta(days=1))
+
+    saldo_inicial = transacoes.filter(realizado_em__lt=inicio_dt).aggregate(
+        total=Coalesce(Sum(variacao), Value(0), output_field=variacao.output_field)
+    )['total']
+
+    periodo = Trunc('realizado_em', AGRUPAMENTOS[agrupamento], output_field=DateField())
+    return list(
+        transacoes.filter(realizado_em__gte=inicio_dt, realizado_em__lt=fim_dt)
+        .annotate(periodo=periodo)
+        .annotate(
+            variacao_periodo=Window(Sum(variacao), partition_by=[periodo]),
+            saldo=ExpressionWrapper(
+                Window(Sum(variacao), order_by=[F('realizado_em').asc(), F('pk').asc()])
+                + Value(saldo_inicial, output_field=variacao.output_field),
+                output_field=variacao.output_field,  # Soma em centavos no banco, convertida para Decimal na leitura
+            ),
+            posicao=Window(RowNumber(), partition_by=[periodo], order_by=[F('realizado_em').desc(), F('pk').desc()]),
+        )
+        .filter(posicao=1)  # Mantém só a última transação de cada período, que carrega o saldo de fechamento
+        .values('periodo', 'saldo', variacao=F('variacao_periodo'))
+        .order_by('periodo')
+    )
+
+
+def obter_serie_saldo(usuario, inicio, fim, agrupamento):
+    """Retorna a série de saldo do cache ou calcula e armazena por (usuário, intervalo, agrupamento)"""
+    chave = f'historico_saldo:{usuario.pk}:{_versao(usuario)}:{inicio}:{fim}:{agrupamento}'
+    serie = cache.get(chave)
+    if serie is None:
+        serie = calcular_serie_saldo(usuario, inicio, fim, agrupamento)
+        cache.set(chave, serie, timeout=CACHE_TIMEOUT)
+    return serie
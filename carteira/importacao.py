@@ -0,0 +1,221 @@
+"""
+Importação em massa do histórico de transações de outro sistema.
+
+O arquivo (CSV com cabeçalho ou NDJSON) é lido em streaming e dividido em
+blocos de linhas consecutivas. Cada bloco é gravado em uma transação própria,
+com COPY no PostgreSQL e bulk_create nos demais bancos, junto com o registro em
+BlocoImportacao: uma importação interrompida retoma pulando os blocos já
+registrados, sem duplicar linhas. Depois da carga, recalcular_carteiras() refaz
+saldos e contadores a partir do histórico completo, por faixa de carteiras.
+
+Campos de cada linha: remetente e destinatario (usernames já cadastrados; o
+destinatário de um depósito pode ser omitido), valor (reais, ex.: "10.50"),
+tipo_transacao (DEPOSITO ou TRANSFERENCIA) e realizado_em (ISO 8601; sem fuso
+é considerado UTC). As transações importadas não geram eventos de outbox, e a
+importação deve rodar com a API parada: o recálculo sobrescreve os saldos.
+"""
+
+import csv
+import io
+import json
+from datetime import timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Count, F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .dinheiro import CENTAVO, MAXIMO_CENTAVOS, de_centavos, para_centavos
+from .models import BlocoImportacao, Carteira, Transacao
+
+TIPOS = {tipo for tipo, _ in Transacao.TIPOS_TRANSACAO}
+MAXIMO_REJEITADAS = 20  # Linhas rejeitadas devolvidas por bloco para o relatório
+COLUNAS = ('remetente_id', 'destinatario_id', 'valor', 'tipo_transacao', 'realizado_em')
+ERRO = '_erro'  # Chave do motivo em registros que não puderam ser lidos
+LINHA = '_linha'  # Chave do número da linha do registro no arquivo (a partir de 1), usado nos relatórios
+
+
+def ler_registros(caminho, formato):
+    """
+    Gera os registros do arquivo (dicionários) um a um, sem carregar o arquivo em memória.
+
+    Cada registro leva em LINHA a linha do arquivo onde começa, contando o
+    cabeçalho do CSV e as linhas em branco do NDJSON. Uma linha NDJSON que não é
+    um objeto JSON válido vira um registro com o motivo em ERRO, rejeitado na
+    validação como as demais linhas inválidas.
+    """
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        if formato == 'csv':
+            leitor = csv.DictReader(arquivo)
+            ultima_linha = 1  # Cabeçalho
+            for registro in leitor:
+                registro[LINHA] = ultima_linha + 1
+                ultima_linha = leitor.line_num  # Um campo entre aspas pode ocupar várias linhas
+                yield registro
+        else:
+            for numero, linha in enumerate(arquivo, start=1):
+                if linha.strip():
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError as erro:
+                        registro = {ERRO: f"JSON inválido: {erro.msg}"}
+                    if not isinstance(registro, dict):
+                        registro = {ERRO: "a linha não é um objeto JSON"}
+                    registro[LINHA] = numero
+                    yield registro
+
+
+def ler_blocos(registros, tamanho_bloco):
+    """Agrupa os registros em (linha_inicial, lista de registros) com tamanho_bloco linhas cada"""
+    bloco = []
+    linha_inicial = 0
+    for registro in registros:
+        bloco.append(registro)
+        if len(bloco) == tamanho_bloco:
+            yield linha_inicial, bloco
+            linha_inicial += len(bloco)
+            bloco = []
+    if bloco:
+        yield linha_inicial, bloco
+
+
+def _texto(registro, campo):
+    return str(registro.get(campo) or '').strip()
+
+
+def _validar(registro, ids_usuarios):
+    """Converte o registro em uma tupla de COLUNAS ou levanta ValueError com o motivo"""
+    if ERRO in registro:
+        raise ValueError(registro[ERRO])
+    remetente = _texto(registro, 'remetente')
+    destinatario = _texto(registro, 'destinatario') or remetente
+    tipo = _texto(registro, 'tipo_transacao').upper()
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo_transacao inválido: {tipo!r}")
+    for username in (remetente, destinatario):
+        if username not in ids_usuarios:
+            raise ValueError(f"usuário não encontrado: {username!r}")
+    if tipo == 'DEPOSITO' and destinatario != remetente:
+        raise ValueError("depósito com destinatário diferente do remetente")
+    if tipo == 'TRANSFERENCIA' and destinatario == remetente:
+        raise ValueError("transferência para o próprio remetente")
+    try:
+        valor = Decimal(str(registro.get('valor')))
+        if valor != valor.quantize(CENTAVO):
+            raise ValueError
+        centavos = para_centavos(valor)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"valor inválido: {registro.get('valor')!r}")
+    if not 0 < centavos <= MAXIMO_CENTAVOS:
+        raise ValueError(f"valor fora do intervalo: {registro.get('valor')!r}")
+    realizado_em = parse_datetime(str(registro.get('realizado_em') or ''))
+    if realizado_em is None:
+        raise ValueError(f"realizado_em inválido: {registro.get('realizado_em')!r}")
+    if timezone.is_naive(realizado_em):
+        realizado_em = timezone.make_aware(realizado_em, dt_timezone.utc)
+    return ids_usuarios[remetente], ids_usuarios[destinatario], centavos, tipo, realizado_em
+
+
+def _copiar(linhas):
+    """Grava as linhas com COPY ... FROM STDIN (PostgreSQL, psycopg2 ou psycopg 3)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for remetente_id, destinatario_id, centavos, tipo, realizado_em in linhas:
+        escritor.writerow((remetente_id, destinatario_id, centavos, tipo, realizado_em.isoformat()))
+    colunas = ', '.join(connection.ops.quote_name(Transacao._meta.get_field(campo).column) for campo in COLUNAS)
+    sql = f"COPY {connection.ops.quote_name(Transacao._meta.db_table)} ({colunas}) FROM STDIN WITH (FORMAT csv)"
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, 'copy_expert'):
+            buffer.seek(0)
+            cursor.cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.cursor.copy(sql) as copia:
+                copia.write(buffer.getvalue())
+
+
+def _inserir(linhas):
+    Transacao.objects.bulk_create([
+        Transacao(
+            remetente_id=remetente_id,
+            destinatario_id=destinatario_id,
+            valor=de_centavos(centavos),
+            tipo_transacao=tipo,
+            realizado_em=realizado_em,
+        )
+        for remetente_id, destinatario_id, centavos, tipo, realizado_em in linhas
+    ], batch_size=2000)
+
+
+def importar_bloco(importacao, linha_inicial, registros):
+    """
+    Valida e grava um bloco em uma transação, registrando-o em BlocoImportacao.
+
+    Retorna (linhas gravadas, linhas rejeitadas, amostra de [linha do arquivo, motivo]);
+    um bloco já registrado por uma execução anterior não é gravado de novo.
+    """
+    usernames = set()
+    for registro in registros:
+        usernames.add(_texto(registro, 'remetente'))
+        usernames.add(_texto(registro, 'destinatario'))
+    ids_usuarios = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+    linhas, rejeitadas = [], []
+    for registro in registros:
+        try:
+            linhas.append(_validar(registro, ids_usuarios))
+        except ValueError as erro:
+            rejeitadas.append([registro[LINHA], str(erro)])
+
+    with transaction.atomic():
+        if BlocoImportacao.objects.filter(importacao=importacao, linha_inicial=linha_inicial).exists():
+            return 0, 0, []
+        if linhas:
+            if connection.vendor == 'postgresql':
+                _copiar(linhas)
+            else:
+                _inserir(linhas)
+        BlocoImportacao.objects.create(importacao=importacao, linha_inicial=linha_inicial, linhas=len(registros))
+    return len(linhas), len(rejeitadas), rejeitadas[:MAXIMO_REJEITADAS]
+
+
+def blocos_importados(importacao):
+    """Linha inicial e tamanho dos blocos já gravados pela importação"""
+    return dict(BlocoImportacao.objects.filter(importacao=importacao).values_list('linha_inicial', 'linhas'))
+
+
+def faixas_carteiras(particoes):
+    """Divide os ids das carteiras em até `particoes` faixas [inicio, fim) contíguas"""
+    limites = Carteira.objects.aggregate(primeiro=Min('pk'), ultimo=Max('pk'))
+    primeiro, ultimo = limites['primeiro'], limites['ultimo']
+    if primeiro is None:
+        return []
+    passo = max(1, -(-(ultimo - primeiro + 1) // particoes))
+    return [(inicio, min(inicio + passo, ultimo + 1)) for inicio in range(primeiro, ultimo + 1, passo)]
+
+
+def recalcular_carteiras(inicio, fim):
+    """
+    Refaz saldo e contadores das carteiras com id em [inicio, fim) a partir de todas as transações.
+
+    Os contadores são calculados pelo banco em uma UPDATE e o saldo (entradas -
+    saídas) em outra, na mesma transação. Faixas diferentes não disputam locks
+    e podem rodar em paralelo. Retorna a quantidade de carteiras atualizadas.
+    """
+    def agregado(expressao, agrupamento, **filtro):
+        return Coalesce(
+            Subquery(Transacao.objects.filter(**filtro).values(agrupamento).annotate(total=expressao).values('total')),
+            Value(0),
+            output_field=BigIntegerField()
+        )
+
+    carteiras = Carteira.objects.filter(pk__gte=inicio, pk__lt=fim)
+    with transaction.atomic():
+        carteiras.update(
+            qtd_transacoes=agregado(Count('pk'), 'remetente', remetente=OuterRef('usuario_id')),
+            total_entradas=agregado(Sum('valor'), 'destinatario', destinatario=OuterRef('usuario_id')),
+            total_saidas=agregado(
+                Sum('valor'), 'remetente', remetente=OuterRef('usuario_id'), tipo_transacao='TRANSFERENCIA'
+            ),
+        )
+        return carteiras.update(saldo=F('total_entradas') - F('total_saidas'), atualizado_em=timezone.now())
@@ -0,0 +1,340 @@
+"""
+Motor opcional de livro-razão em memória para depósitos e transferências.
+
+Os saldos ficam em um array de inteiros (centavos) indexado pelo slot de cada
+carteira e todas as operações passam por um único escritor. Antes de ser
+confirmada ao cliente, cada operação é gravada em um log de escrita antecipada
+(WAL) mapeado em memória; o msync é feito em grupo, então operações
+concorrentes compartilham o mesmo fsync. Uma thread de descarga grava
+periodicamente no banco, em lote e em uma única transação, as transações, os
+eventos de outbox, os saldos finais com os contadores das carteiras e o
+checkpoint da última sequência gravada.
+
+Ao iniciar, as operações do WAL com sequência maior que o checkpoint do banco
+são reaplicadas e gravadas (recuperação após queda).
+
+O livro-razão precisa ser o único escritor dos saldos: só pode ser usado com um
+único processo atendendo depósitos e transferências, e um lock de arquivo no
+diretório do WAL impede que um segundo processo o inicie. Os saldos no banco
+ficam atrasados em relação à memória em até INTERVALO_DESCARGA segundos.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from .dinheiro import cabe_no_limite, de_centavos, para_centavos
+from .exceptions import LimiteSaldoExcedido, LogCheio, SaldoInsuficiente
+from .models import Carteira, CheckpointLivroRazao, EventoTransacao, Transacao, contadores_das_operacoes
+from .outbox import montar_evento
+
+logger = logging.getLogger(__name__)
+
+DEPOSITO = 1
+TRANSFERENCIA = 2
+TIPOS_TRANSACAO = {DEPOSITO: 'DEPOSITO', TRANSFERENCIA: 'TRANSFERENCIA'}
+
+# Registro do WAL: sequência, tipo, remetente, destinatário (ids de usuário), centavos, realizado_em (µs)
+CAMPOS = struct.Struct('<QBqqqq')
+CRC = struct.Struct('<I')
+TAMANHO_REGISTRO = 48  # CAMPOS + CRC (45 bytes) arredondado
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class SegmentoLog:
+    """Arquivo de tamanho fixo, mapeado em memória, com registros de operações em sequência"""
+
+    def __init__(self, caminho, tamanho):
+        modo = 'r+b' if os.path.exists(caminho) else 'w+b'
+        self.arquivo = open(caminho, modo)
+        if os.fstat(self.arquivo.fileno()).st_size < tamanho:
+            self.arquivo.truncate(tamanho)
+        self.mapa = mmap.mmap(self.arquivo.fileno(), tamanho)
+        self.capacidade = tamanho // TAMANHO_REGISTRO
+        self.posicao = 0  # Índice do próximo registro
+        self.posicao_duravel = 0  # Registros anteriores a este índice já passaram por msync
+        self.ultima_sequencia = 0
+
+    def ler(self):
+        """Retorna os registros válidos a partir do início: CRC correto e sequências consecutivas"""
+        registros = []
+        for indice in range(self.capacidade):
+            inicio = indice * TAMANHO_REGISTRO
+            bruto = self.mapa[inicio:inicio + CAMPOS.size]
+            (crc,) = CRC.unpack_from(self.mapa, inicio + CAMPOS.size)
+            campos = CAMPOS.unpack(bruto)
+            if campos[0] == 0 or zlib.crc32(bruto) != crc:
+                break  # Fim do log ou escrita incompleta
+            if registros and campos[0] != registros[-1][0] + 1:
+                break  # Restos de um uso anterior do segmento
+            registros.append(campos)
+        self.posicao = self.posicao_duravel = len(registros)
+        self.ultima_sequencia = registros[-1][0] if registros else 0
+        return registros
+
+    def cheio(self):
+        return self.posicao >= self.capacidade
+
+    def escrever(self, campos):
+        bruto = CAMPOS.pack(*campos)
+        inicio = self.posicao * TAMANHO_REGISTRO
+        self.mapa[inicio:inicio + CAMPOS.size] = bruto
+        CRC.pack_into(self.mapa, inicio + CAMPOS.size, zlib.crc32(bruto))
+        self.posicao += 1
+        self.ultima_sequencia = campos[0]
+
+    def sincronizar(self, ate):
+        """Faz o msync das páginas entre a última posição durável e o registro `ate`"""
+        inicio = self.posicao_duravel * TAMANHO_REGISTRO // mmap.PAGESIZE * mmap.PAGESIZE
+        fim = ate * TAMANHO_REGISTRO
+        if fim > inicio:
+            self.mapa.flush(inicio, fim - inicio)
+        self.posicao_duravel = max(self.posicao_duravel, ate)
+
+    def reiniciar(self):
+        """Volta a escrever do início; só pode ser chamado quando todo o conteúdo já está no banco"""
+        self.posicao = self.posicao_duravel = 0
+        self.ultima_sequencia = 0
+
+    def fechar(self):
+        self.mapa.close()
+        self.arquivo.close()
+
+
+class LivroRazao:
+    """Saldos em memória com escritor único, WAL com fsync em grupo e descarga assíncrona em lote no banco"""
+
+    def __init__(self, diretorio, tamanho_segmento=64 * 1024 * 1024, tamanho_lote_banco=500):
+        os.makedirs(diretorio, exist_ok=True)
+        self._trava_arquivo = open(os.path.join(diretorio, 'livro_razao.lock'), 'w')
+        try:
+            fcntl.flock(self._trava_arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._trava_arquivo.close()
+            raise ImproperlyConfigured(f"O livro-razão em {diretorio} já está em uso por outro processo")
+
+        self._segmentos = [
+            SegmentoLog(os.path.join(diretorio, f'wal.{indice}'), tamanho_segmento) for indice in range(2)
+        ]
+        self._atual = 0
+        self._tamanho_lote_banco = tamanho_lote_banco
+
+        self._lock = threading.Lock()  # Escritor único: saldos, sequência, pendentes e segmento atual
+        self._checkpoint_avancou = threading.Condition(self._lock)
+        self._lock_descarga = threading.Lock()  # Garante que os lotes cheguem ao banco em ordem
+        self._lock_sincronizacao = threading.Lock()  # O primeiro a chegar faz o msync por todos
+
+        self._saldos = array('q')  # Centavos, indexados pelo slot da carteira
+        self._entradas = array('q')  # Total de entradas em centavos, para o limite do BIGINT
+        self._carteiras = array('q')  # Id da carteira de cada slot
+        self._slots = {}  # id do usuário -> slot
+        self._pendentes = []  # Operações aplicadas em memória e ainda não gravadas no banco
+        self._sequencia = 0
+        self._sequencia_duravel = 0
+        self._checkpoint = 0
+
+        self._parar = threading.Event()
+        self._thread = None
+
+        self._recuperar()
+
+    # Inicialização e recuperação
+
+    def _recuperar(self):
+        """Reaplica as operações do WAL posteriores ao checkpoint do banco e as grava"""
+        checkpoint, _ = CheckpointLivroRazao.objects.get_or_create(pk=1)
+        self._checkpoint = checkpoint.ultima_sequencia
+
+        registros = []
+        for segmento in self._segmentos:
+            registros.extend(segmento.ler())
+        self._atual = max(range(2), key=lambda indice: self._segmentos[indice].ultima_sequencia)
+        self._sequencia = self._sequencia_duravel = max(
+            self._checkpoint, *(segmento.ultima_sequencia for segmento in self._segmentos)
+        )
+
+        pendentes = sorted((r for r in registros if r[0] > self._checkpoint), key=lambda r: r[0])
+        with self._lock:
+            for campos in pendentes:
+                self._aplicar(campos)
+        if pendentes:
+            logger.warning("Livro-razão: %d operações recuperadas do WAL", len(pendentes))
+            self.descarregar()
+
+    def iniciar(self, intervalo_descarga):
+        """Inicia a thread que grava as operações pendentes no banco a cada intervalo_descarga segundos"""
+        self._thread = threading.Thread(
+            target=self._laco_descarga, args=(intervalo_descarga,), name='livro-razao-descarga', daemon=True
+        )
+        self._thread.start()
+
+    def _laco_descarga(self, intervalo):
+        while not self._parar.wait(intervalo):
+            try:
+                self.descarregar()
+            except Exception:
+                logger.exception("Livro-razão: falha ao gravar o lote no banco, nova tentativa no próximo ciclo")
+        self.descarregar()
+        connection.close()
+
+    def encerrar(self, descarregar=True):
+        """Para a thread de descarga, grava o que falta (se pedido) e libera os arquivos do WAL"""
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+        elif descarregar:
+            self.descarregar()
+        for segmento in self._segmentos:
+            segmento.fechar()
+        fcntl.flock(self._trava_arquivo, fcntl.LOCK_UN)
+        self._trava_arquivo.close()
+
+    # Operações
+
+    def depositar(self, usuario_id, centavos):
+        with self._lock:
+            self._verificar_limite(self._slot(usuario_id), centavos)
+            sequencia = self._registrar(DEPOSITO, usuario_id, usuario_id, centavos)
+        self._aguardar_durabilidade(sequencia)
+
+    def transferir(self, remetente_id, destinatario_id, centavos):
+        with self._lock:
+            origem = self._slot(remetente_id)
+            destino = self._slot(destinatario_id)
+            if self._saldos[origem] < centavos:
+                raise SaldoInsuficiente()
+            self._verificar_limite(destino, centavos)
+            sequencia = self._registrar(TRANSFERENCIA, remetente_id, destinatario_id, centavos)
+        self._aguardar_durabilidade(sequencia)
+
+    def saldo(self, usuario_id):
+        """Saldo atual em memória, em centavos"""
+        with self._lock:
+            return self._saldos[self._slot(usuario_id)]
+
+    def _verificar_limite(self, destino, centavos):
+        """Recusa a operação antes de ir para o WAL se o destino passaria do BIGINT (não seria reaplicável)"""
+        if not (cabe_no_limite(self._saldos[destino], centavos) and cabe_no_limite(self._entradas[destino], centavos)):
+            raise LimiteSaldoExcedido()
+
+    def _slot(self, usuario_id):
+        """Slot da carteira do usuário, carregando o saldo do banco na primeira vez"""
+        slot = self._slots.get(usuario_id)
+        if slot is None:
+            carteira_id, saldo, entradas = Carteira.objects.values_list('pk', 'saldo', 'total_entradas').get(
+                usuario_id=usuario_id
+            )
+            slot = len(self._saldos)
+            self._saldos.append(para_centavos(saldo))
+            self._entradas.append(para_centavos(entradas))
+            self._carteiras.append(carteira_id)
+            self._slots[usuario_id] = slot
+        return slot
+
+    def _aplicar(self, campos):
+        _, tipo, remetente_id, destinatario_id, centavos, _ = campos
+        if tipo == TRANSFERENCIA:
+            self._saldos[self._slot(remetente_id)] -= centavos
+        destino = self._slot(destinatario_id)
+        self._saldos[destino] += centavos
+        self._entradas[destino] += centavos
+        self._pendentes.append(campos)
+
+    def _registrar(self, tipo, remetente_id, destinatario_id, centavos):
+        """Grava a operação no WAL e a aplica em memória; chamado com self._lock"""
+        segmento = self._segmento_com_espaco()
+        self._sequencia += 1
+        campos = (self._sequencia, tipo, remetente_id, destinatario_id, centavos, time.time_ns() // 1000)
+        segmento.escrever(campos)
+        self._aplicar(campos)
+        return self._sequencia
+
+    def _segmento_com_espaco(self):
+        """Troca de segmento quando o atual enche, esperando o outro ter sido todo gravado no banco"""
+        while self._segmentos[self._atual].cheio():
+            atual, outro = self._segmentos[self._atual], self._segmentos[1 - self._atual]
+            if outro.ultima_sequencia <= self._checkpoint:
+                atual.sincronizar(atual.posicao)  # O segmento antigo precisa estar durável antes da troca
+                outro.reiniciar()
+                self._atual = 1 - self._atual
+            elif self._thread is None:
+                raise LogCheio("Os dois segmentos do WAL têm operações pendentes; chame descarregar()")
+            else:
+                self._checkpoint_avancou.wait(timeout=1)
+        return self._segmentos[self._atual]
+
+    def _aguardar_durabilidade(self, sequencia):
+        """fsync em grupo: um msync cobre todas as operações registradas até o momento"""
+        with self._lock_sincronizacao:
+            if self._sequencia_duravel >= sequencia:
+                return  # Outra thread já sincronizou esta operação
+            with self._lock:
+                segmento = self._segmentos[self._atual]
+                ate, ultima = segmento.posicao, self._sequencia
+            segmento.sincronizar(ate)
+            self._sequencia_duravel = ultima
+
+    # Descarga no banco
+
+    def descarregar(self):
+        """Grava no banco as operações pendentes em uma única transação e retorna quantas foram gravadas"""
+        with self._lock_descarga:
+            with self._lock:
+                lote, self._pendentes = self._pendentes, []
+                if not lote:
+                    return 0
+                slots = {self._slots[r[2]] for r in lote} | {self._slots[r[3]] for r in lote}
+                saldos = {self._carteiras[slot]: self._saldos[slot] for slot in slots}
+                contadores = {
+                    self._carteiras[self._slots[usuario_id]]: valores
+                    for usuario_id, valores in contadores_das_operacoes(
+                        (TIPOS_TRANSACAO[tipo], remetente_id, destinatario_id, centavos)
+                        for _, tipo, remetente_id, destinatario_id, centavos, _ in lote
+                    ).items()
+                }
+            try:
+                self._gravar(lote, saldos, contadores)
+            except Exception:
+                with self._lock:
+                    self._pendentes[:0] = lote  # Mantém a ordem para a próxima tentativa
+                raise
+            with self._lock:
+                self._checkpoint = lote[-1][0]
+                self._checkpoint_avancou.notify_all()
+        return len(lote)
+
+    def _gravar(self, lote, saldos, contadores):
+        ids_usuarios = {r[2] for r in lote} | {r[3] for r in lote}
+        usuarios = {
+            pk: User(pk=pk, username=username)
+            for pk, username in User.objects.filter(pk__in=ids_usuarios).values_list('pk', 'username')
+        }
+        transacoes = [
+            Transacao(
+                remetente=usuarios[remetente_id],
+                destinatario=usuarios[destinatario_id],
+                valor=de_centavos(centavos),
+                tipo_transacao=TIPOS_TRANSACAO[tipo],
+                realizado_em=EPOCH + timedelta(microseconds=realizado_em),
+            )
+            for _, tipo, remetente_id, destinatario_id, centavos, realizado_em in lote
+        ]
+
+        with transaction.atomic():
+            Transacao.objects.bulk_create(transacoes, batch_size=self._tamanho_lote_banco)
+            EventoTransacao.objects.bulk_create(
+                [montar_evento(t) for t in transacoes], batch_size=self._tamanho_lote_banco
+            )
+            Carteira.objects.definir_saldos(saldos, contadores, tamanho_bloco=self._tamanho_lote_banco)
+            CheckpointLivroRazao.objects.filter(pk=1).update(ultima_sequencia=lote[-1][0])
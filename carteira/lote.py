@@ -0,0 +1,139 @@
+"""
+Motor opcional de group commit para depósitos e transferências.
+
+Requisições concorrentes entram em uma fila; a primeira a chegar vira líder,
+espera JANELA segundos para juntar as demais e aplica todo o lote em uma única
+transação do banco: locks das carteiras em ordem de id (sem deadlock entre
+lotes), validação de saldo (e do limite do BIGINT) operação a operação em centavos, uma UPDATE ... CASE
+para os saldos e bulk_create das transações e dos eventos de outbox. Cada
+requisição recebe o próprio resultado. Enquanto um lote é gravado, o próximo
+se acumula na fila e o seu primeiro integrante é promovido a líder, então o
+custo do commit é dividido por todas as operações do lote.
+"""
+
+import threading
+import time
+from django.db import transaction
+from .dinheiro import cabe_no_limite, de_centavos, para_centavos
+from .exceptions import LimiteSaldoExcedido, SaldoInsuficiente
+from .models import Carteira, EventoTransacao, Transacao, contadores_das_operacoes
+from .outbox import montar_evento
+
+
+class Operacao:
+    """Operação na fila do coordenador e o resultado devolvido à requisição que a enviou"""
+
+    def __init__(self, tipo_transacao, remetente_id, destinatario_id, centavos):
+        self.tipo_transacao = tipo_transacao
+        self.remetente_id = remetente_id
+        self.destinatario_id = destinatario_id
+        self.centavos = centavos
+        self.sinal = threading.Event()
+        self.pronta = False
+        self.erro = None
+
+
+class CoordenadorLote:
+    def __init__(self, janela=0.002, tamanho_maximo=200):
+        self._janela = janela
+        self._tamanho_maximo = tamanho_maximo
+        self._lock = threading.Lock()
+        self._fila = []
+        self._lider_ativo = False
+
+    def depositar(self, usuario_id, centavos):
+        self._executar(Operacao('DEPOSITO', usuario_id, usuario_id, centavos))
+
+    def transferir(self, remetente_id, destinatario_id, centavos):
+        self._executar(Operacao('TRANSFERENCIA', remetente_id, destinatario_id, centavos))
+
+    def encerrar(self, **kwargs):
+        """Nada a liberar: a fila só existe enquanto há requisições aguardando"""
+
+    def _executar(self, operacao):
+        with self._lock:
+            self._fila.append(operacao)
+            lider = not self._lider_ativo
+            self._lider_ativo = True
+        if lider:
+            time.sleep(self._janela)  # Janela para as requisições concorrentes entrarem no lote
+            self._liderar()
+        while not operacao.pronta:
+            operacao.sinal.wait()
+            if not operacao.pronta:
+                # Promovida a líder do próximo lote, que já se acumulou durante a gravação do anterior
+                operacao.sinal.clear()
+                self._liderar()
+        if operacao.erro is not None:
+            raise operacao.erro
+
+    def _liderar(self):
+        with self._lock:
+            lote = self._fila[:self._tamanho_maximo]
+            del self._fila[:len(lote)]
+        try:
+            aplicar_lote(lote)
+        except Exception as erro:
+            for operacao in lote:
+                operacao.erro = operacao.erro or erro
+        finally:
+            for operacao in lote:
+                operacao.pronta = True
+                operacao.sinal.set()
+            with self._lock:
+                if self._fila:
+                    self._fila[0].sinal.set()
+                else:
+                    self._lider_ativo = False
+
+
+def aplicar_lote(lote):
+    """Aplica as operações em uma transação; as rejeitadas recebem o erro em operacao.erro"""
+    ids_usuarios = {op.remetente_id for op in lote} | {op.destinatario_id for op in lote}
+    with transaction.atomic():
+        carteiras = {
+            carteira.usuario_id: carteira
+            for carteira in Carteira.objects.select_for_update(of=('self',))
+            .select_related('usuario')
+            .filter(usuario_id__in=ids_usuarios)
+            .order_by('pk')  # Locks sempre na mesma ordem
+        }
+        saldos = {usuario_id: para_centavos(carteira.saldo) for usuario_id, carteira in carteiras.items()}
+        entradas = {usuario_id: para_centavos(carteira.total_entradas) for usuario_id, carteira in carteiras.items()}
+
+        aceitas = []
+        for op in lote:
+            if op.remetente_id not in carteiras or op.destinatario_id not in carteiras:
+                op.erro = Carteira.DoesNotExist("Carteira não encontrada")
+            elif op.tipo_transacao == 'TRANSFERENCIA' and saldos[op.remetente_id] < op.centavos:
+                op.erro = SaldoInsuficiente()
+            elif not (cabe_no_limite(saldos[op.destinatario_id], op.centavos)
+                      and cabe_no_limite(entradas[op.destinatario_id], op.centavos)):
+                op.erro = LimiteSaldoExcedido()
+            else:
+                if op.tipo_transacao == 'TRANSFERENCIA':
+                    saldos[op.remetente_id] -= op.centavos
+                saldos[op.destinatario_id] += op.centavos
+                entradas[op.destinatario_id] += op.centavos
+                aceitas.append(op)
+        if not aceitas:
+            return
+
+        transacoes = Transacao.objects.bulk_create([
+            Transacao(
+                remetente=carteiras[op.remetente_id].usuario,
+                destinatario=carteiras[op.destinatario_id].usuario,
+                valor=de_centavos(op.centavos),
+                tipo_transacao=op.tipo_transacao,
+            )
+            for op in aceitas
+        ])
+        EventoTransacao.objects.bulk_create([montar_evento(t) for t in transacoes])
+
+        contadores = contadores_das_operacoes(
+            (op.tipo_transacao, op.remetente_id, op.destinatario_id, op.centavos) for op in aceitas
+        )
+        Carteira.objects.definir_saldos(
+            {carteiras[uid].pk: saldos[uid] for uid in contadores},
+            contadores={carteiras[uid].pk: valores for uid, valores in contadores.items()},
+        )
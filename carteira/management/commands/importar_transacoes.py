@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from carteira.importacao import (
+    blocos_importados,
+    faixas_carteiras,
+    importar_bloco,
+    ler_blocos,
+    ler_registros,
+    recalcular_carteiras,
+)
+from carteira.models import Carteira
+
+
+class Command(BaseCommand):
+    help = "Importa em massa o histórico de transações (CSV ou NDJSON) e recalcula os saldos das carteiras"
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Arquivo CSV (com cabeçalho) ou NDJSON")
+        parser.add_argument('--formato', choices=['csv', 'ndjson'], help="Padrão: pela extensão do arquivo")
+        parser.add_argument('--nome', help="Nome da importação, usado para retomar (padrão: nome do arquivo)")
+        parser.add_argument('--tamanho-bloco', type=int, default=10000, help="Linhas por transação")
+        parser.add_argument('--processos', type=int, help="Processos paralelos (padrão: CPUs no PostgreSQL e 1 nos demais; "
+                                                          "no SQLite, mais de um exige OPTIONS transaction_mode IMMEDIATE)")
+        parser.add_argument('--sem-recalculo', action='store_true', help="Não recalcula saldos e contadores ao final")
+        parser.add_argument('--intervalo-progresso', type=float, default=5.0, help="Segundos entre os relatórios")
+
+    def handle(self, *args, **options):
+        arquivo = options['arquivo']
+        if not os.path.isfile(arquivo):
+            raise CommandError(f"Arquivo não encontrado: {arquivo}")
+        formato = options['formato'] or ('ndjson' if arquivo.endswith(('.ndjson', '.jsonl')) else 'csv')
+        nome = options['nome'] or os.path.basename(arquivo)
+        tamanho_bloco = options['tamanho_bloco']
+        processos = options['processos'] or (os.cpu_count() if connection.vendor == 'postgresql' else 1)
+
+        # Blocos gravados por uma execução anterior interrompida são pulados. Só é possível retomar com o
+        # mesmo --tamanho-bloco: todo bloco gravado tem essa quantidade de linhas, exceto o último do arquivo
+        importados = blocos_importados(nome)
+        ultimo = max(importados, default=None)
+        if any(
+            inicio % tamanho_bloco or linhas > tamanho_bloco or (linhas < tamanho_bloco and inicio != ultimo)
+            for inicio, linhas in importados.items()
+        ):
+            raise CommandError(f"A importação {nome!r} foi iniciada com outro --tamanho-bloco")
+        if importados:
+            self.stdout.write(f"Retomando {nome!r}: {len(importados)} blocos já importados")
+
+        pool = None
+        if processos > 1:
+            connections.close_all()  # Os processos filhos não podem herdar conexões abertas
+            pool = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('fork'))
+        try:
+            self._importar(pool, processos, nome, ler_blocos(ler_registros(arquivo, formato), tamanho_bloco),
+                           importados, options['intervalo_progresso'])
+            if not options['sem_recalculo']:
+                self._recalcular(pool, processos)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _executar(self, pool, processos, tarefas):
+        """Executa as tarefas (função, *args) no pool, ou neste processo, e gera os resultados"""
+        if pool is None:
+            for funcao, *argumentos in tarefas:
+                yield funcao(*argumentos)
+            return
+        pendentes = set()
+        for funcao, *argumentos in tarefas:
+            pendentes.add(pool.submit(funcao, *argumentos))
+            if len(pendentes) >= processos * 2:  # Limita os blocos lidos e ainda não gravados
+                concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    yield futuro.result()
+        for futuro in as_completed(pendentes):
+            yield futuro.result()
+
+    def _importar(self, pool, processos, nome, blocos, importados, intervalo_progresso):
+        contagem = {'puladas': 0}
+
+        def tarefas():
+            for linha_inicial, registros in blocos:
+                if linha_inicial in importados:
+                    if importados[linha_inicial] != len(registros):  # Bloco curto que não era o fim do arquivo
+                        raise CommandError(f"A importação {nome!r} foi iniciada com outro --tamanho-bloco "
+                                           f"ou o arquivo mudou desde então")
+                    contagem['puladas'] += len(registros)
+                    continue
+                yield importar_bloco, nome, linha_inicial, registros
+
+        inicio = ultimo_relatorio = time.monotonic()
+        gravadas = rejeitadas = 0
+        amostra = []
+        for gravadas_bloco, rejeitadas_bloco, amostra_bloco in self._executar(pool, processos, tarefas()):
+            gravadas += gravadas_bloco
+            rejeitadas += rejeitadas_bloco
+            amostra.extend(amostra_bloco)
+            if time.monotonic() - ultimo_relatorio >= intervalo_progresso:
+                ultimo_relatorio = time.monotonic()
+                self.stdout.write(
+                    f"{gravadas} linhas gravadas, {rejeitadas} rejeitadas "
+                    f"({gravadas / (ultimo_relatorio - inicio):.0f} linhas/s)"
+                )
+
+        duracao = time.monotonic() - inicio
+        for linha, motivo in sorted(amostra)[:20]:
+            self.stderr.write(f"Linha {linha} rejeitada: {motivo}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{gravadas} linhas gravadas, {rejeitadas} rejeitadas e {contagem['puladas']} já importadas "
+            f"em {duracao:.1f} s ({gravadas / duracao if duracao else 0:.0f} linhas/s)"
+        ))
+
+    def _recalcular(self, pool, processos):
+        """Recalcula saldos e contadores por faixas de carteiras, em paralelo"""
+        inicio = time.monotonic()
+        faixas = faixas_carteiras(processos)
+        if pool is not None:
+            connections.close_all()
+        atualizadas = sum(self._executar(pool, processos, ((recalcular_carteiras, *faixa) for faixa in faixas)))
+        self.stdout.write(self.style.SUCCESS(
+            f"Saldos de {atualizadas} carteiras recalculados em {time.monotonic() - inicio:.1f} s"
+        ))
+        negativas = Carteira.objects.filter(saldo__lt=0).count()
+        if negativas:
+            self.stderr.write(self.style.WARNING(
+                f"{negativas} carteiras ficaram com saldo negativo: o histórico importado está incompleto"
+            ))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Remove em lotes os tokens expirados da lista de tokens emitidos e da lista de revogação"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Tokens removidos por transação")
+        parser.add_argument('--pausa', type=float, default=0.0, help="Espera (s) entre lotes, para aliviar o banco")
+
+    def handle(self, *args, **options):
+        agora = timezone.now()
+        total = 0
+        while True:
+            # Usa o índice de expires_at (migração 0009) e mantém cada DELETE curto
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=agora)
+                .order_by('expires_at')
+                .values_list('pk', flat=True)[:options['lote']]
+            )
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} tokens expirados removidos"))
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from carteira.outbox import obter_sink, publicar_pendentes
+
+
+class Command(BaseCommand):
+    help = "Entrega os eventos pendentes do outbox de transações ao sink configurado"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Quantidade máxima de eventos por entrega")
+        parser.add_argument('--continuo', action='store_true', help="Continua rodando e aguardando novos eventos")
+        parser.add_argument('--intervalo', type=float, default=1.0, help="Espera (s) quando não há eventos pendentes")
+
+    def handle(self, *args, **options):
+        sink = obter_sink()
+        total = 0
+        while True:
+            entregues = publicar_pendentes(sink, options['lote'])
+            total += entregues
+            if entregues:
+                continue  # Ainda pode haver pendentes, busca o próximo lote sem esperar
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} eventos entregues"))
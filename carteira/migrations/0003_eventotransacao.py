@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0002_rename_criado_em_transacao_realizado_em"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventoTransacao",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tipo_evento", models.CharField(max_length=30)),
+                ("payload", models.JSONField()),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("publicado_em", models.DateTimeField(blank=True, null=True)),
+                (
+                    "transacao",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="evento",
+                        to="carteira.transacao",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("publicado_em__isnull", True)),
+                        fields=["id"],
+                        name="carteira_evento_pendente_idx",
+                    )
+                ],
+            },
+        ),
+    ]
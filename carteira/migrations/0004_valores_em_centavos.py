@@ -0,0 +1,98 @@
+# Converte Carteira.saldo e Transacao.valor de DECIMAL(10, 2) para BIGINT em centavos
+
+import carteira.dinheiro
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+
+def copiar_para_centavos(apps, schema_editor):
+    """Preenche as colunas em centavos com uma única UPDATE por tabela"""
+    Carteira = apps.get_model("carteira", "Carteira")
+    Transacao = apps.get_model("carteira", "Transacao")
+    Carteira.objects.update(
+        saldo_centavos=Cast(Round(F("saldo") * 100), models.BigIntegerField())
+    )
+    Transacao.objects.update(
+        valor_centavos=Cast(Round(F("valor") * 100), models.BigIntegerField())
+    )
+
+
+def copiar_para_decimal(apps, schema_editor):
+    """Caminho de volta: os campos em centavos já são lidos como Decimal"""
+    Carteira = apps.get_model("carteira", "Carteira")
+    Transacao = apps.get_model("carteira", "Transacao")
+    for modelo, origem, destino in (
+        (Carteira, "saldo_centavos", "saldo"),
+        (Transacao, "valor_centavos", "valor"),
+    ):
+        lote = []
+        for objeto in modelo.objects.only("pk", origem).iterator(chunk_size=2000):
+            setattr(objeto, destino, getattr(objeto, origem))
+            lote.append(objeto)
+            if len(lote) == 2000:
+                modelo.objects.bulk_update(lote, [destino])
+                lote = []
+        modelo.objects.bulk_update(lote, [destino])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0003_eventotransacao"),
+    ]
+
+    operations = [
+        # Permite voltar a migração com linhas existentes (a coluna antiga é recriada vazia)
+        migrations.AlterField(
+            model_name="transacao",
+            name="valor",
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name="carteira",
+            name="saldo_centavos",
+            field=carteira.dinheiro.CentavosField(default=0),
+        ),
+        migrations.AddField(
+            model_name="transacao",
+            name="valor_centavos",
+            field=carteira.dinheiro.CentavosField(default=0),
+        ),
+        migrations.RunPython(copiar_para_centavos, copiar_para_decimal),
+        migrations.RemoveField(
+            model_name="carteira",
+            name="saldo",
+        ),
+        migrations.RemoveField(
+            model_name="transacao",
+            name="valor",
+        ),
+        migrations.RenameField(
+            model_name="carteira",
+            old_name="saldo_centavos",
+            new_name="saldo",
+        ),
+        migrations.RenameField(
+            model_name="transacao",
+            old_name="valor_centavos",
+            new_name="valor",
+        ),
+        migrations.AlterField(
+            model_name="carteira",
+            name="saldo",
+            field=carteira.dinheiro.CentavosField(
+                default=0,
+                validators=[django.core.validators.MinValueValidator(Decimal("0.00"))],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transacao",
+            name="valor",
+            field=carteira.dinheiro.CentavosField(
+                validators=[django.core.validators.MinValueValidator(Decimal("0.01"))],
+            ),
+        ),
+    ]
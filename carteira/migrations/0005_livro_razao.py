@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0004_valores_em_centavos"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckpointLivroRazao",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ultima_sequencia", models.BigIntegerField(default=0)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="transacao",
+            name="realizado_em",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
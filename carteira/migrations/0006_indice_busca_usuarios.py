@@ -0,0 +1,33 @@
+# Índice para a busca de usuários por prefixo (username__istartswith) no PostgreSQL
+
+from django.db import migrations
+
+NOME_INDICE = "carteira_usuario_prefixo_idx"
+
+
+def criar_indice(apps, schema_editor):
+    """UPPER(username::text) é a expressão gerada pelo istartswith; text_pattern_ops permite LIKE 'abc%'"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {NOME_INDICE} '
+        f'ON auth_user (UPPER(username::text) text_pattern_ops)'
+    )
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {NOME_INDICE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("carteira", "0005_livro_razao"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
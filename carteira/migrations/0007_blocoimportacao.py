@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0006_indice_busca_usuarios"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlocoImportacao",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("importacao", models.CharField(max_length=255)),
+                ("linha_inicial", models.BigIntegerField()),
+                ("linhas", models.IntegerField()),
+                ("importado_em", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("importacao", "linha_inicial"),
+                        name="carteira_bloco_importacao_unico",
+                    )
+                ],
+            },
+        ),
+    ]
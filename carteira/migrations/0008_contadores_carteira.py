@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:31
+
+import carteira.dinheiro
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    """Calcula os contadores das carteiras existentes com uma única UPDATE"""
+    Carteira = apps.get_model("carteira", "Carteira")
+    Transacao = apps.get_model("carteira", "Transacao")
+
+    def agregado(filtro, agrupamento, expressao):
+        return Coalesce(
+            Subquery(
+                Transacao.objects.filter(**filtro).values(agrupamento).annotate(total=expressao).values("total")
+            ),
+            Value(0),
+            output_field=models.BigIntegerField(),
+        )
+
+    Carteira.objects.update(
+        qtd_transacoes=agregado({"remetente": OuterRef("usuario_id")}, "remetente", Count("pk")),
+        total_entradas=agregado({"destinatario": OuterRef("usuario_id")}, "destinatario", Sum("valor")),
+        total_saidas=agregado(
+            {"remetente": OuterRef("usuario_id"), "tipo_transacao": "TRANSFERENCIA"}, "remetente", Sum("valor")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0007_blocoimportacao"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="carteira",
+            name="qtd_transacoes",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="carteira",
+            name="total_entradas",
+            field=carteira.dinheiro.CentavosField(default=0),
+        ),
+        migrations.AddField(
+            model_name="carteira",
+            name="total_saidas",
+            field=carteira.dinheiro.CentavosField(default=0),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
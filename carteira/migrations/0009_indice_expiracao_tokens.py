@@ -0,0 +1,28 @@
+# Índice para a limpeza periódica de tokens expirados (comando limpar_tokens)
+
+from django.db import migrations
+
+NOME_INDICE = "carteira_token_expira_idx"
+
+
+def criar_indice(apps, schema_editor):
+    """O app token_blacklist é de terceiros: o índice é criado por SQL, sem alterar o modelo dele"""
+    OutstandingToken = apps.get_model("token_blacklist", "OutstandingToken")
+    tabela = schema_editor.quote_name(OutstandingToken._meta.db_table)
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {NOME_INDICE} ON {tabela} (expires_at)")
+
+
+def remover_indice(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {NOME_INDICE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0008_contadores_carteira"),
+        ("token_blacklist", "0012_alter_outstandingtoken_user"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
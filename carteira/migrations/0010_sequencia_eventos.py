@@ -0,0 +1,42 @@
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def numerar_publicados(apps, schema_editor):
+    """Eventos já publicados recebem o próprio id como sequência, mantendo válidos os cursores dos consumidores"""
+    EventoTransacao = apps.get_model('carteira', 'EventoTransacao')
+    SequenciaEventos = apps.get_model('carteira', 'SequenciaEventos')
+    publicados = EventoTransacao.objects.filter(publicado_em__isnull=False)
+    publicados.update(sequencia=F('pk'))
+    SequenciaEventos.objects.create(pk=1, ultima=publicados.aggregate(ultima=Max('pk'))['ultima'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carteira", "0009_indice_expiracao_tokens"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SequenciaEventos",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ultima", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="eventotransacao",
+            name="sequencia",
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(numerar_publicados, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,79 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+from .dinheiro import CentavosField
+
+# Contadores do histórico de cada carteira, mantidos junto com o saldo
+CONTADORES = ('qtd_transacoes', 'total_entradas', 'total_saidas')
+
+
+def contadores_das_operacoes(operacoes):
+    """
+    Soma o efeito de (tipo_transacao, remetente_id, destinatario_id, centavos) nos contadores.
+
+    Retorna {usuario_id: [transações no histórico, entradas, saídas]}, valores em
+    centavos. Como em /api/transacoes/, o histórico de um usuário são as
+    transações em que ele é o remetente: depósitos e transferências enviadas.
+    """
+    contadores = {}
+    for tipo_transacao, remetente_id, destinatario_id, centavos in operacoes:
+        remetente = contadores.setdefault(remetente_id, [0, 0, 0])
+        remetente[0] += 1
+        if tipo_transacao == 'TRANSFERENCIA':
+            remetente[2] += centavos
+        contadores.setdefault(destinatario_id, [0, 0, 0])[1] += centavos
+    return contadores
+
+
+# Operações em lote sobre as carteiras, usadas pelos motores que gravam várias operações de uma vez
+class CarteiraManager(models.Manager):
+    def definir_saldos(self, saldos, contadores=None, tamanho_bloco=500):
+        """
+        Grava os saldos finais ({id da carteira: centavos}) com uma UPDATE ... CASE por bloco.
+
+        `contadores` ({id da carteira: (transações, entradas, saídas)}) são somados
+        aos contadores atuais na mesma UPDATE.
+        """
+        contadores = contadores or {}
+        itens = list(saldos.items())
+        agora = timezone.now()
+        for inicio in range(0, len(itens), tamanho_bloco):
+            bloco = itens[inicio:inicio + tamanho_bloco]
+            campos = {
+                'saldo': models.Case(
+                    *[models.When(pk=pk, then=models.Value(centavos)) for pk, centavos in bloco],
+                    output_field=models.BigIntegerField()
+                ),
+                'atualizado_em': agora,  # update() não aplica o auto_now
+            }
+            incrementos = [(pk, contadores[pk]) for pk, _ in bloco if pk in contadores]
+            if incrementos:
+                for indice, campo in enumerate(CONTADORES):
+                    campos[campo] = models.Case(
+                        *[models.When(pk=pk, then=models.F(campo) + valores[indice]) for pk, valores in incrementos],
+                        default=models.F(campo),
+                        output_field=models.BigIntegerField()
+                    )
+            self.filter(pk__in=[pk for pk, _ in bloco]).update(**campos)
 
 # Modelo que representa a carteira de um usuário
 class Carteira(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.CASCADE)
-    saldo = models.DecimalField(
-        max_digits=10,  # Suporta valores grandes, até 99999999.99
-        decimal_places=2,  # Apenas duas casas decimais, adequado para valores monetários
+    saldo = CentavosField(  # Armazenado em centavos (BIGINT), suporta saldos de até 92 quatrilhões
         default=0,  # Saldo inicial da carteira é 0
         validators=[MinValueValidator(Decimal('0.00'))]  # Garante que o saldo nunca seja negativo
     )
+    # Contadores do histórico, atualizados na mesma UPDATE do saldo: resumo e paginação sem COUNT/SUM
+    qtd_transacoes = models.BigIntegerField(default=0)  # Transações em que o usuário é o remetente
+    total_entradas = CentavosField(default=0)  # Depósitos e transferências recebidas
+    total_saidas = CentavosField(default=0)  # Transferências enviadas
     criado_em = models.DateTimeField(auto_now_add=True) # Registra automaticamente a data de criação da carteira
     atualizado_em = models.DateTimeField(auto_now=True) # Atualiza automaticamente a data sempre que a carteira for atualizada
-    
+
+    objects = CarteiraManager()
+
     def __str__(self):
         return f"Carteira de {self.usuario.username}"
 
@@ -37,9 +96,7 @@ class Transacao(models.Model):
         related_name='transacoes_recebidas'  # Permite acessar as transações recebidas por um usuário
     )
     # Valor
-    valor = models.DecimalField(
-        max_digits=10,  
-        decimal_places=2, 
+    valor = CentavosField(  # Armazenado em centavos, exposto como Decimal com duas casas
         validators=[MinValueValidator(Decimal('0.01'))]  # Garante que transações tenham valor mínimo de R$ 0,01
     )
     # Define o tipo da transação
@@ -48,7 +105,70 @@ class Transacao(models.Model):
         choices=TIPOS_TRANSACAO
     )
 
-    realizado_em = models.DateTimeField(auto_now_add=True) # Registra automaticamente a data e hora da transação
+    # Registra a data e hora da transação; motores assíncronos gravam o horário original da operação
+    realizado_em = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"{self.tipo_transacao} - {self.remetente.username} para {self.destinatario.username}: R${self.valor}"
+
+# Última operação do livro-razão em memória já gravada no banco (linha única)
+class CheckpointLivroRazao(models.Model):
+    ultima_sequencia = models.BigIntegerField(default=0)  # Sequência do log de escrita antecipada
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Checkpoint do livro-razão: {self.ultima_sequencia}"
+
+# Última sequência de publicação de eventos (linha única); travada pelo relay até o commit da publicação
+class SequenciaEventos(models.Model):
+    ultima = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Sequência de eventos: {self.ultima}"
+
+# Bloco de linhas já gravado por uma importação de histórico, registrado na mesma transação das linhas
+class BlocoImportacao(models.Model):
+    importacao = models.CharField(max_length=255)  # Nome da importação (por padrão, o nome do arquivo)
+    linha_inicial = models.BigIntegerField()  # Posição da primeira linha do bloco no arquivo, a partir de 0
+    linhas = models.IntegerField()
+    importado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['importacao', 'linha_inicial'], name='carteira_bloco_importacao_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.importacao}: linhas {self.linha_inicial} a {self.linha_inicial + self.linhas - 1}"
+
+# Evento de saída (outbox) gravado na mesma transação atômica que a operação financeira
+class EventoTransacao(models.Model):
+    TIPOS_EVENTO = {
+        'DEPOSITO': 'deposito.realizado',
+        'TRANSFERENCIA': 'transferencia.realizada',
+    }
+    # A sequência atribuída pelo relay (não o id) é o cursor do feed: ids são reservados no INSERT e
+    # podem ficar visíveis fora de ordem, enquanto as sequências ficam visíveis na ordem em que são atribuídas
+    transacao = models.OneToOneField(
+        Transacao,
+        on_delete=models.PROTECT,  # Eventos não podem perder a transação de origem
+        related_name='evento'
+    )
+    tipo_evento = models.CharField(max_length=30)
+    payload = models.JSONField()  # Dados da transação no momento do commit, prontos para entrega
+    criado_em = models.DateTimeField(auto_now_add=True)
+    publicado_em = models.DateTimeField(null=True, blank=True)  # Preenchido pelo relay após a entrega ao sink
+    sequencia = models.BigIntegerField(null=True, blank=True, unique=True)  # Posição no feed, atribuída pelo relay
+
+    class Meta:
+        indexes = [
+            # Índice parcial: o relay só percorre os eventos ainda não publicados
+            models.Index(
+                fields=['id'],
+                condition=models.Q(publicado_em__isnull=True),
+                name='carteira_evento_pendente_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo_evento} #{self.pk}"
@@ -0,0 +1,54 @@
+import threading
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Motores alternativos para depósitos e transferências; sem motor configurado as views usam o banco diretamente
+_motores = {}
+_lock = threading.Lock()
+
+
+def _criar_livro_razao():
+    from .livro_razao import LivroRazao
+
+    config = settings.CARTEIRA_LIVRO_RAZAO
+    motor = LivroRazao(config['DIRETORIO'], tamanho_segmento=config.get('TAMANHO_SEGMENTO', 64 * 1024 * 1024))
+    if config.get('INTERVALO_DESCARGA'):
+        motor.iniciar(config['INTERVALO_DESCARGA'])
+    return motor
+
+
+def _criar_coordenador_lote():
+    from .lote import CoordenadorLote
+
+    config = settings.CARTEIRA_LOTE
+    return CoordenadorLote(janela=config.get('JANELA', 0.002), tamanho_maximo=config.get('TAMANHO_MAXIMO', 200))
+
+
+FABRICAS = {
+    'livro_razao': _criar_livro_razao,
+    'lote': _criar_coordenador_lote,
+}
+
+
+def obter_motor():
+    """Retorna o motor configurado em CARTEIRA_MOTOR (criado uma vez por processo) ou None"""
+    nome = getattr(settings, 'CARTEIRA_MOTOR', '')
+    if not nome:
+        return None
+    motor = _motores.get(nome)
+    if motor is None:
+        with _lock:
+            motor = _motores.get(nome)
+            if motor is None:
+                if nome not in FABRICAS:
+                    raise ImproperlyConfigured(f"CARTEIRA_MOTOR desconhecido: {nome}")
+                motor = _motores[nome] = FABRICAS[nome]()
+    return motor
+
+
+def encerrar_motores(**kwargs):
+    """Encerra os motores criados neste processo (repassa kwargs para encerrar())"""
+    with _lock:
+        while _motores:
+            _, motor = _motores.popitem()
+            motor.encerrar(**kwargs)
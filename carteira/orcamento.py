@@ -0,0 +1,99 @@
+"""
+Orçamento de consultas SQL por endpoint.
+
+Cada ViewSet declara em `orcamento_consultas` o máximo de comandos SQL de cada
+ação, já contando a consulta de autenticação do JWT. O middleware conta os
+comandos de cada requisição e, ao passar do orçamento, escreve um aviso no log
+"carteira.orcamento" ou, com ESTRITO (usado nos testes), levanta
+OrcamentoExcedido. Para trechos de código e testes pontuais há o
+limite_consultas(), que funciona como context manager e como decorator.
+
+Com CARTEIRA_MOTOR="lote", a requisição que lidera um lote executa as consultas
+de todo o lote e pode passar do orçamento de depósito ou transferência.
+"""
+
+import logging
+from contextlib import ContextDecorator
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from .exceptions import OrcamentoExcedido
+
+logger = logging.getLogger(__name__)
+
+# Valores usados quando a chave não está presente em settings.CARTEIRA_ORCAMENTO
+PADROES = {
+    'ATIVO': False,  # Sem o middleware ativo, nenhuma requisição é contada
+    'ESTRITO': False,  # Levanta OrcamentoExcedido em vez de apenas registrar o aviso
+}
+
+
+def config(chave):
+    return getattr(settings, 'CARTEIRA_ORCAMENTO', {}).get(chave, PADROES[chave])
+
+
+# Controle de transação não conta: o SQLite executa BEGIN como comando e o PostgreSQL não
+CONTROLE_TRANSACAO = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class ContadorConsultas:
+    """Execute wrapper que guarda o SQL de cada comando executado"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(CONTROLE_TRANSACAO):
+            self.consultas.append(sql)
+        return execute(sql, params, many, context)
+
+    def descricao(self, nome, limite):
+        linhas = '\n'.join(f'  {indice}. {sql[:200]}' for indice, sql in enumerate(self.consultas, start=1))
+        return f"{nome}: {len(self.consultas)} consultas SQL, orçamento de {limite}\n{linhas}"
+
+
+class limite_consultas(ContextDecorator):
+    """Falha com OrcamentoExcedido se o bloco executar mais de `limite` comandos SQL"""
+
+    def __init__(self, limite, nome='bloco'):
+        self.limite = limite
+        self.nome = nome
+
+    def __enter__(self):
+        self.contador = ContadorConsultas()
+        self._wrapper = connection.execute_wrapper(self.contador)
+        self._wrapper.__enter__()
+        return self.contador
+
+    def __exit__(self, tipo, valor, traceback):
+        self._wrapper.__exit__(tipo, valor, traceback)
+        if tipo is None and len(self.contador.consultas) > self.limite:
+            raise OrcamentoExcedido(self.contador.descricao(self.nome, self.limite))
+        return False
+
+
+def orcamento_da_view(resolver_match, metodo):
+    """Orçamento declarado pelo ViewSet para a ação que atendeu a requisição, ou None"""
+    funcao = getattr(resolver_match, 'func', None)
+    acao = getattr(funcao, 'actions', {}).get(metodo.lower())
+    return getattr(getattr(funcao, 'cls', None), 'orcamento_consultas', {}).get(acao)
+
+
+class OrcamentoConsultasMiddleware:
+    def __init__(self, get_response):
+        if not config('ATIVO'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = ContadorConsultas()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+
+        limite = orcamento_da_view(getattr(request, 'resolver_match', None), request.method)
+        if limite is not None and len(contador.consultas) > limite:
+            descricao = contador.descricao(f'{request.method} {request.path}', limite)
+            if config('ESTRITO'):
+                raise OrcamentoExcedido(descricao)
+            logger.warning("Orçamento de consultas excedido em %s", descricao)
+        return response
@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import EventoTransacao, SequenciaEventos
+
+# Valores usados quando a chave não está presente em settings.CARTEIRA_OUTBOX
+PADROES = {
+    'SINK': 'carteira.outbox.ArquivoSink',
+    'SINK_OPCOES': {'caminho': 'eventos_outbox.ndjson'},
+    'LONG_POLL_MAX': 10,  # Tempo máximo (s) que o feed segura uma requisição esperando novos eventos
+    'LONG_POLL_INTERVALO': 1,  # Intervalo (s) entre consultas durante o long-polling
+}
+
+
+def config(chave):
+    return getattr(settings, 'CARTEIRA_OUTBOX', {}).get(chave, PADROES[chave])
+
+
+def montar_evento(transacao):
+    """Monta (sem salvar) o evento de outbox de uma transação recém-criada"""
+    return EventoTransacao(
+        transacao=transacao,
+        tipo_evento=EventoTransacao.TIPOS_EVENTO[transacao.tipo_transacao],
+        payload={
+            'transacao_id': transacao.pk,
+            'tipo_transacao': transacao.tipo_transacao,
+            'remetente_id': transacao.remetente_id,
+            'remetente': transacao.remetente.username,
+            'destinatario_id': transacao.destinatario_id,
+            'destinatario': transacao.destinatario.username,
+            'valor': str(transacao.valor),
+            'realizado_em': transacao.realizado_em.isoformat(),
+        },
+    )
+
+
+def registrar_evento(transacao):
+    """Grava o evento da transação; deve ser chamado dentro do mesmo transaction.atomic() da operação"""
+    evento = montar_evento(transacao)
+    evento.save()
+    return evento
+
+
+def buscar_eventos(usuario, cursor, limite, aguardar=0):
+    """
+    Retorna os eventos já publicados com sequência maior que o cursor, em ordem crescente.
+
+    O feed acompanha o relay: um evento aparece depois de publicado, e como a
+    sequência é atribuída sob um lock mantido até o commit, nenhum evento fica
+    visível atrás de um cursor já entregue (o que o id, reservado no INSERT,
+    não garante). Se não houver eventos, consulta novamente a cada
+    LONG_POLL_INTERVALO até `aguardar` segundos, limitado a LONG_POLL_MAX: no
+    máximo LONG_POLL_MAX / LONG_POLL_INTERVALO + 1 consultas por requisição.
+    Usuários comuns recebem apenas os eventos das transações das quais
+    participam; staff recebe todos.
+    """
+    eventos = EventoTransacao.objects.filter(sequencia__gt=cursor).order_by('sequencia')
+    if not usuario.is_staff:
+        eventos = eventos.filter(Q(transacao__remetente=usuario) | Q(transacao__destinatario=usuario))
+
+    esperas = int(min(aguardar, config('LONG_POLL_MAX')) // config('LONG_POLL_INTERVALO'))
+    for _ in range(esperas):
+        pagina = list(eventos[:limite])
+        if pagina:
+            return pagina
+        time.sleep(config('LONG_POLL_INTERVALO'))
+    return list(eventos[:limite])
+
+
+class ArquivoSink:
+    """Sink para testes locais: acrescenta cada evento como uma linha JSON em um arquivo"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def enviar(self, eventos):
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            for evento in eventos:
+                linha = {
+                    'id': evento.pk,
+                    'sequencia': evento.sequencia,  # Mesma chave do cursor do feed
+                    'tipo_evento': evento.tipo_evento,
+                    **evento.payload,
+                }
+                arquivo.write(json.dumps(linha, ensure_ascii=False) + '\n')
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+
+def obter_sink():
+    """Instancia o sink configurado em CARTEIRA_OUTBOX['SINK'] com as opções de SINK_OPCOES"""
+    return import_string(config('SINK'))(**config('SINK_OPCOES'))
+
+
+def publicar_pendentes(sink, tamanho_lote):
+    """
+    Entrega ao sink o próximo lote de eventos não publicados e os marca como publicados.
+
+    A entrega é "at-least-once": se a marcação falhar depois do envio, o lote
+    é reenviado na próxima execução. Os eventos do lote ficam bloqueados com
+    SKIP LOCKED para que vários relays possam rodar em paralelo. Antes do
+    envio, o relay trava a linha de SequenciaEventos e numera o lote, então o
+    sink recebe cada evento já com a sequência usada no cursor do feed; o lock
+    vai até o commit, então relays paralelos tornam as sequências visíveis na
+    mesma ordem em que as atribuíram. Um lote reenviado após uma falha pode
+    chegar ao sink com outras sequências.
+    """
+    with transaction.atomic():
+        eventos = list(
+            EventoTransacao.objects.select_for_update(skip_locked=True)
+            .filter(publicado_em__isnull=True)
+            .order_by('pk')[:tamanho_lote]
+        )
+        if eventos:
+            contador, _ = SequenciaEventos.objects.select_for_update().get_or_create(pk=1)
+            agora = timezone.now()
+            for indice, evento in enumerate(eventos, start=1):
+                evento.sequencia = contador.ultima + indice
+                evento.publicado_em = agora
+            sink.enviar(eventos)
+            EventoTransacao.objects.bulk_update(eventos, ['sequencia', 'publicado_em'])
+            contador.ultima += len(eventos)
+            contador.save(update_fields=['ultima'])
+    return len(eventos)
@@ -0,0 +1,144 @@
+"""
+Perfil de contenção de locks e de transações lentas nas operações financeiras.
+
+travar() avalia a consulta select_for_update das views e registra, para cada
+carteira travada, quanto tempo a consulta levou (no PostgreSQL, quase todo esse
+tempo é espera pelo lock de outra transação). As views travam uma carteira por
+consulta, então cada espera é atribuída só à carteira que a causou. monitor_locks guarda essas
+esperas em intervalos de INTERVALO segundos e mantém apenas os da última JANELA,
+de onde sai o ranking das carteiras mais disputadas. perfilar_transacao()
+registra cada consulta SQL do bloco e, se o bloco passar de
+LIMITE_TRANSACAO_LENTA segundos, escreve no log a linha do tempo das consultas.
+
+Os dados ficam na memória de cada processo (cada worker do servidor tem os seus).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Valores usados quando a chave não está presente em settings.CARTEIRA_PERFIL
+PADROES = {
+    'JANELA': 300,  # Segundos de esperas considerados no ranking
+    'INTERVALO': 10,  # Segundos por intervalo da janela; intervalos antigos são descartados inteiros
+    'TOP': 20,  # Carteiras no relatório
+    'LIMITE_TRANSACAO_LENTA': 0.5,  # Segundos a partir dos quais a transação vai para o log
+}
+
+
+def config(chave):
+    return getattr(settings, 'CARTEIRA_PERFIL', {}).get(chave, PADROES[chave])
+
+
+class MonitorLocks:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._intervalos = deque()  # (número do intervalo, {carteira_id: [esperas, total, máximo]})
+
+    def registrar(self, carteira_ids, espera):
+        intervalo = int(time.time() // config('INTERVALO'))
+        with self._lock:
+            if not self._intervalos or self._intervalos[-1][0] != intervalo:
+                self._intervalos.append((intervalo, {}))
+                self._descartar_antigos(intervalo)
+            esperas = self._intervalos[-1][1]
+            for carteira_id in carteira_ids:
+                estatistica = esperas.setdefault(carteira_id, [0, 0.0, 0.0])
+                estatistica[0] += 1
+                estatistica[1] += espera
+                estatistica[2] = max(estatistica[2], espera)
+
+    def _descartar_antigos(self, intervalo_atual):
+        primeiro = intervalo_atual - config('JANELA') // config('INTERVALO')
+        while self._intervalos and self._intervalos[0][0] <= primeiro:
+            self._intervalos.popleft()
+
+    def relatorio(self, top=None):
+        """Carteiras com maior tempo total de espera na janela, da mais disputada para a menos"""
+        with self._lock:
+            self._descartar_antigos(int(time.time() // config('INTERVALO')))
+            totais = {}
+            for _, esperas in self._intervalos:
+                for carteira_id, (quantidade, total, maximo) in esperas.items():
+                    acumulado = totais.setdefault(carteira_id, [0, 0.0, 0.0])
+                    acumulado[0] += quantidade
+                    acumulado[1] += total
+                    acumulado[2] = max(acumulado[2], maximo)
+        ranking = sorted(totais.items(), key=lambda item: item[1][1], reverse=True)[:top or config('TOP')]
+        return {
+            'janela_s': config('JANELA'),
+            'carteiras': [
+                {
+                    'carteira_id': carteira_id,
+                    'locks': quantidade,
+                    'espera_total_ms': round(total * 1000, 3),
+                    'espera_media_ms': round(total / quantidade * 1000, 3),
+                    'espera_maxima_ms': round(maximo * 1000, 3),
+                }
+                for carteira_id, (quantidade, total, maximo) in ranking
+            ],
+        }
+
+    def limpar(self):
+        with self._lock:
+            self._intervalos.clear()
+
+
+monitor_locks = MonitorLocks()
+
+
+def travar(consulta):
+    """
+    Avalia uma consulta select_for_update de carteiras e registra o tempo da consulta para cada uma; retorna a lista.
+
+    Com várias carteiras na mesma consulta, a espera total é registrada para
+    todas; para um ranking por carteira, trave uma carteira por consulta.
+    """
+    inicio = time.perf_counter()
+    carteiras = list(consulta)
+    monitor_locks.registrar([carteira.pk for carteira in carteiras], time.perf_counter() - inicio)
+    return carteiras
+
+
+class PerfilTransacao:
+    """Execute wrapper que guarda (início relativo, duração, SQL) de cada consulta do bloco"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.inicio = time.perf_counter()
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((inicio - self.inicio, time.perf_counter() - inicio, sql))
+
+    def linha_do_tempo(self):
+        return '\n'.join(
+            f'  +{deslocamento * 1000:8.1f} ms {duracao * 1000:8.1f} ms  {sql[:200]}'
+            for deslocamento, duracao, sql in self.consultas
+        )
+
+
+@contextmanager
+def perfilar_transacao(nome):
+    """Registra as consultas do bloco e escreve a linha do tempo no log se ele for lento (inclui o commit)"""
+    perfil = PerfilTransacao(nome)
+    try:
+        with connection.execute_wrapper(perfil):
+            yield perfil
+    finally:
+        duracao = time.perf_counter() - perfil.inicio
+        if duracao >= config('LIMITE_TRANSACAO_LENTA'):
+            logger.warning(
+                "Transação lenta em %s: %.1f ms, %d consultas\n%s",
+                nome, duracao * 1000, len(perfil.consultas), perfil.linha_do_tempo()
+            )
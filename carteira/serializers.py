@@ -1,6 +1,10 @@
+from datetime import timedelta
 from rest_framework import serializers
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Carteira, Transacao
+from .models import Carteira, Transacao, EventoTransacao
+from .historico import AGRUPAMENTOS, DATA_MAXIMA, DATA_MINIMA
+from .dinheiro import MAX_DIGITOS
 
 # Função para criação e gerenciamento de usuários
 class UsuarioSerializer(serializers.ModelSerializer):
@@ -21,19 +25,29 @@ class UsuarioSerializer(serializers.ModelSerializer):
         Carteira.objects.create(usuario=user)  # Ao criar um usuário, cria-se automaticamente uma carteira associada
         return user
 
+# Parâmetros da busca de usuários por prefixo do username
+class BuscaUsuariosSerializer(serializers.Serializer):
+    busca = serializers.CharField(required=False, allow_blank=True, max_length=150, default='')
+
 # Função para exibição do saldo da carteira
 class CarteiraSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='usuario.username', read_only=True)  # Inclui o nome do usuário na resposta
+    saldo = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2, read_only=True)  # Centavos no banco, decimal no JSON
+    # Resumo do histórico lido dos contadores da carteira, sem COUNT/SUM sobre as transações
+    total_entradas = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2, read_only=True)
+    total_saidas = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2, read_only=True)
 
     class Meta:
         model = Carteira
-        fields = ('id', 'username', 'saldo', 'criado_em', 'atualizado_em')
-        read_only_fields = ('saldo',)  # Garante que o saldo não pode ser alterado via API
+        fields = ('id', 'username', 'saldo', 'qtd_transacoes', 'total_entradas', 'total_saidas',
+                  'criado_em', 'atualizado_em')
+        read_only_fields = ('saldo', 'qtd_transacoes')  # Garante que o saldo não pode ser alterado via API
 
 # Função para exibição de transações
 class TransacaoSerializer(serializers.ModelSerializer):
     remetente_username = serializers.CharField(source='remetente.username', read_only=True)
     destinatario_username = serializers.CharField(source='destinatario.username', read_only=True)
+    valor = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2, read_only=True)
     data = serializers.DateTimeField(source='realizado_em', format='%Y-%m-%d', read_only=True)  # Formata data e hora separadamente
     hora = serializers.DateTimeField(source='realizado_em', format='%H:%M:%S', read_only=True)  
 
@@ -46,7 +60,7 @@ class TransacaoSerializer(serializers.ModelSerializer):
 # Função para validar dados de transferência
 class TransferenciaSerializer(serializers.Serializer):
     destinatario_username = serializers.CharField()  # Nome do usuário destinatário
-    valor = serializers.DecimalField(max_digits=10, decimal_places=2)  # Valor a ser transferido
+    valor = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2)  # Valor a ser transferido
 
     def validate_valor(self, value):
         """Garante que o valor da transferência seja positivo"""
@@ -56,10 +70,47 @@ class TransferenciaSerializer(serializers.Serializer):
 
 # Função para validar depósitos
 class DepositoSerializer(serializers.Serializer):
-    valor = serializers.DecimalField(max_digits=10, decimal_places=2)  # Valor a ser depositado
+    valor = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2)  # Valor a ser depositado
 
     def validate_valor(self, value):
         """Garante que o valor do depósito seja positivo"""
         if value <= 0:
             raise serializers.ValidationError("O valor do depósito deve ser maior que zero")
         return value
+
+# Função para validar os parâmetros do histórico de saldo
+class HistoricoSaldoSerializer(serializers.Serializer):
+    inicio = serializers.DateField(required=False)  # Padrão: 30 dias antes do fim
+    fim = serializers.DateField(required=False)  # Padrão: data de hoje
+    agrupamento = serializers.ChoiceField(choices=list(AGRUPAMENTOS), default='dia')
+
+    def validate(self, attrs):
+        """Preenche o intervalo padrão e garante que o início não seja posterior ao fim"""
+        for campo in ('inicio', 'fim'):
+            if campo in attrs and not DATA_MINIMA <= attrs[campo] <= DATA_MAXIMA:
+                raise serializers.ValidationError(
+                    {campo: f"Informe uma data entre {DATA_MINIMA.isoformat()} e {DATA_MAXIMA.isoformat()}"}
+                )
+        attrs.setdefault('fim', timezone.localdate())
+        attrs.setdefault('inicio', attrs['fim'] - timedelta(days=30))
+        if attrs['inicio'] > attrs['fim']:
+            raise serializers.ValidationError("A data de início deve ser anterior ou igual à data de fim")
+        return attrs
+
+# Função para exibição de cada ponto da série de saldo
+class SerieSaldoSerializer(serializers.Serializer):
+    periodo = serializers.DateField()  # Primeiro dia do período (dia, semana ou mês)
+    variacao = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2)  # Movimentação líquida no período
+    saldo = serializers.DecimalField(max_digits=MAX_DIGITOS, decimal_places=2)  # Saldo ao final do período
+
+# Função para validar os parâmetros do feed de eventos
+class FeedEventosSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(min_value=0, default=0)  # Última sequência de evento já recebida pelo consumidor
+    limite = serializers.IntegerField(min_value=1, max_value=500, default=100)
+    aguardar = serializers.FloatField(min_value=0, default=0)  # Segundos de long-polling, limitados a LONG_POLL_MAX
+
+# Função para exibição dos eventos do outbox
+class EventoTransacaoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EventoTransacao
+        fields = ('id', 'sequencia', 'tipo_evento', 'payload', 'criado_em')
@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .destinatarios import cache_destinatarios
+from .diretorio import invalidar_diretorio_usuarios
+from .models import Carteira
+
+
+# Um usuário salvo pode ter sido renomeado: remove qualquer entrada que aponte para ele
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_destinatario_usuario(sender, instance, **kwargs):
+    cache_destinatarios.invalidar(username=instance.username, usuario_id=instance.pk)
+
+
+# Cadastros, renomeações e exclusões mudam as páginas do diretório de usuários
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_diretorio(sender, **kwargs):
+    invalidar_diretorio_usuarios()
+
+
+@receiver(post_delete, sender=Carteira)
+def invalidar_destinatario_carteira(sender, instance, **kwargs):
+    cache_destinatarios.invalidar(usuario_id=instance.usuario_id)
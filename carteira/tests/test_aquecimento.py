@@ -0,0 +1,18 @@
+from django.test import TestCase
+from setup.aquecimento import aquecer_aplicacao, aquecer_rotas, aquecer_serializers
+
+
+# Testes para o aquecimento da aplicação antes do fork dos workers
+class AquecimentoTest(TestCase):
+    def test_aquecer_rotas_resolve_rotas_do_app(self):
+        """Teste se as rotas nomeadas (incluindo as do router do app) são resolvidas"""
+        self.assertGreaterEqual(aquecer_rotas(), 8)
+
+    def test_aquecer_serializers(self):
+        """Teste se todos os serializers do app são construídos"""
+        self.assertGreaterEqual(aquecer_serializers(), 7)
+
+    def test_aquecer_aplicacao_com_conexoes(self):
+        """Teste se o aquecimento completo retorna o tempo de cada etapa"""
+        tempos = aquecer_aplicacao(abrir_conexoes=True)
+        self.assertEqual(set(tempos), {'rotas', 'serializers', 'drf', 'conexoes'})
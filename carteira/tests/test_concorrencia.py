@@ -0,0 +1,132 @@
+import threading
+import time
+from decimal import Decimal
+from unittest import skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from carteira.destinatarios import cache_destinatarios
+from carteira.models import Carteira, Transacao
+from carteira.perfil import monitor_locks
+
+
+def em_paralelo(quantidade, funcao):
+    """Executa funcao(indice) em `quantidade` threads liberadas juntas; retorna os resultados em ordem"""
+    barreira = threading.Barrier(quantidade)
+    resultados = [None] * quantidade
+
+    def trabalhador(indice):
+        try:
+            barreira.wait()
+            resultados[indice] = funcao(indice)
+        except Exception as erro:
+            resultados[indice] = erro
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=trabalhador, args=(indice,)) for indice in range(quantidade)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+# Testes de concorrência dos locks de linha (select_for_update); o SQLite não tem locks de linha
+@skipUnless(
+    connection.features.has_select_for_update,
+    f"Sem locks de linha no banco de teste ({settings.TESTES_POSTGRES_MOTIVO or connection.vendor})"
+)
+class ConcorrenciaTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        cache_destinatarios.limpar()
+        monitor_locks.limpar()
+        self.usuarios = [
+            User.objects.create_user(username=f'usuario{indice}', password='testpass123') for indice in range(2)
+        ]
+        for usuario in self.usuarios:
+            Carteira.objects.create(usuario=usuario, saldo=Decimal('100.00'))
+
+    def postar(self, usuario, nome_url, dados):
+        api_client = APIClient()
+        api_client.force_authenticate(user=usuario)
+        return api_client.post(reverse(nome_url), dados, format='json').status_code
+
+    def test_depositos_concorrentes_sem_atualizacao_perdida(self):
+        """Teste se depósitos simultâneos na mesma carteira são todos somados"""
+        usuario = self.usuarios[0]
+        resultados = em_paralelo(10, lambda _: [
+            self.postar(usuario, 'carteira-deposito', {'valor': '1.00'}) for _ in range(5)
+        ])
+
+        self.assertEqual(resultados, [[status.HTTP_200_OK] * 5] * 10)
+        carteira = Carteira.objects.get(usuario=usuario)
+        self.assertEqual(carteira.saldo, Decimal('150.00'))
+        self.assertEqual(carteira.qtd_transacoes, 50)
+        self.assertEqual(carteira.total_entradas, Decimal('50.00'))
+        self.assertEqual(Transacao.objects.filter(tipo_transacao='DEPOSITO').count(), 50)
+
+    def test_transferencias_cruzadas_sem_deadlock(self):
+        """Teste se transferências A->B e B->A simultâneas terminam sem deadlock e preservam o total"""
+        a, b = self.usuarios
+
+        def transferir(indice):
+            remetente, destinatario = (a, b) if indice % 2 == 0 else (b, a)
+            return [
+                self.postar(remetente, 'carteira-transferencia',
+                            {'destinatario_username': destinatario.username, 'valor': '1.00'})
+                for _ in range(5)
+            ]
+
+        resultados = em_paralelo(8, transferir)
+
+        self.assertEqual(resultados, [[status.HTTP_200_OK] * 5] * 8)
+        saldos = dict(Carteira.objects.values_list('usuario_id', 'saldo'))
+        self.assertEqual(saldos, {a.pk: Decimal('100.00'), b.pk: Decimal('100.00')})
+        self.assertEqual(Transacao.objects.filter(tipo_transacao='TRANSFERENCIA').count(), 40)
+
+    def test_saldo_nunca_negativo(self):
+        """Teste se transferências simultâneas acima do saldo são rejeitadas, sem saldo negativo"""
+        a, b = self.usuarios
+        Carteira.objects.filter(usuario=a).update(saldo=Decimal('10.00'))
+
+        resultados = em_paralelo(20, lambda _: self.postar(
+            a, 'carteira-transferencia', {'destinatario_username': b.username, 'valor': '1.00'}
+        ))
+
+        self.assertEqual(resultados.count(status.HTTP_200_OK), 10)
+        self.assertEqual(resultados.count(status.HTTP_400_BAD_REQUEST), 10)
+        self.assertEqual(Carteira.objects.get(usuario=a).saldo, Decimal('0.00'))
+        self.assertEqual(Carteira.objects.get(usuario=b).saldo, Decimal('110.00'))
+
+    def test_deposito_espera_lock_de_outra_transacao(self):
+        """Teste se o depósito espera o lock de uma transação aberta e a espera aparece no monitor de locks"""
+        usuario = self.usuarios[0]
+        travada = threading.Event()
+
+        def segurar_lock(indice):
+            if indice == 0:
+                with transaction.atomic():
+                    list(Carteira.objects.select_for_update().filter(usuario=usuario))
+                    travada.set()
+                    time.sleep(0.3)
+                return None
+            travada.wait()
+            inicio = time.perf_counter()
+            codigo = self.postar(usuario, 'carteira-deposito', {'valor': '1.00'})
+            return codigo, time.perf_counter() - inicio
+
+        _, (codigo, duracao) = em_paralelo(2, segurar_lock)
+
+        self.assertEqual(codigo, status.HTTP_200_OK)
+        self.assertGreaterEqual(duracao, 0.2)
+        carteira = Carteira.objects.get(usuario=usuario)
+        self.assertEqual(carteira.saldo, Decimal('101.00'))
+        [espera] = monitor_locks.relatorio()['carteiras']
+        self.assertEqual(espera['carteira_id'], carteira.pk)
+        self.assertGreaterEqual(espera['espera_maxima_ms'], 200)
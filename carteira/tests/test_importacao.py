@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase
+from carteira.models import BlocoImportacao, Carteira, Transacao
+
+
+# Testes para a importação em massa do histórico de transações
+class ImportarTransacoesTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        for username in ('ana', 'bruno'):
+            Carteira.objects.create(usuario=User.objects.create_user(username=username, password='testpass123'))
+        self.diretorio = tempfile.mkdtemp()
+
+    def escrever(self, nome, conteudo):
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def importar(self, caminho, **opcoes):
+        saida, erros = StringIO(), StringIO()
+        call_command('importar_transacoes', caminho, processos=1, stdout=saida, stderr=erros, **opcoes)
+        return saida.getvalue(), erros.getvalue()
+
+    def test_importacao_csv_e_recalculo(self):
+        """Teste se as linhas válidas são gravadas, as inválidas relatadas e os saldos recalculados"""
+        caminho = self.escrever('historico.csv', (
+            "remetente,destinatario,valor,tipo_transacao,realizado_em\n"
+            "ana,,100.00,DEPOSITO,2023-01-02T10:00:00\n"
+            "ana,bruno,30.50,TRANSFERENCIA,2023-01-03T10:00:00Z\n"
+            "ana,fantasma,1.00,TRANSFERENCIA,2023-01-04T10:00:00Z\n"
+            "bruno,ana,0.001,TRANSFERENCIA,2023-01-05T10:00:00Z\n"
+        ))
+        saida, erros = self.importar(caminho, tamanho_bloco=3)
+
+        self.assertIn('2 linhas gravadas, 2 rejeitadas', saida)
+        self.assertIn('Linha 4 rejeitada: usuário não encontrado', erros)  # Linhas do arquivo, contando o cabeçalho
+        self.assertIn('Linha 5 rejeitada: valor inválido', erros)
+        self.assertEqual(Transacao.objects.count(), 2)
+        self.assertEqual(Carteira.objects.get(usuario__username='ana').saldo, Decimal('69.50'))
+        self.assertEqual(Carteira.objects.get(usuario__username='bruno').saldo, Decimal('30.50'))
+        self.assertEqual(
+            Carteira.objects.values_list('qtd_transacoes', 'total_entradas', 'total_saidas').get(usuario__username='ana'),
+            (2, Decimal('100.00'), Decimal('30.50'))
+        )
+        self.assertEqual(BlocoImportacao.objects.filter(importacao='historico.csv').count(), 2)
+
+    def test_retomada_pula_blocos_importados(self):
+        """Teste se uma segunda execução não duplica os blocos já gravados"""
+        linhas = [
+            {'remetente': 'ana', 'valor': '10.00', 'tipo_transacao': 'DEPOSITO', 'realizado_em': f'2023-01-0{dia}T10:00:00Z'}
+            for dia in range(1, 6)
+        ]
+        caminho = self.escrever('historico.ndjson', '\n'.join(json.dumps(linha) for linha in linhas))
+        BlocoImportacao.objects.create(importacao='historico.ndjson', linha_inicial=0, linhas=2)  # Execução interrompida
+
+        saida, _ = self.importar(caminho, tamanho_bloco=2)
+        self.assertIn('3 linhas gravadas, 0 rejeitadas e 2 já importadas', saida)
+
+        saida, _ = self.importar(caminho, tamanho_bloco=2)
+        self.assertIn('0 linhas gravadas, 0 rejeitadas e 5 já importadas', saida)
+        self.assertEqual(Transacao.objects.count(), 3)
+        self.assertEqual(Carteira.objects.get(usuario__username='ana').saldo, Decimal('30.00'))
+
+    def test_retomada_com_outro_tamanho_de_bloco(self):
+        """Teste se retomar com um tamanho de bloco diferente (maior ou divisor do original) é recusado"""
+        linhas = [
+            {'remetente': 'ana', 'valor': '1.00', 'tipo_transacao': 'DEPOSITO', 'realizado_em': '2023-01-01T10:00:00Z'}
+        ] * 8
+        caminho = self.escrever('historico.ndjson', '\n'.join(json.dumps(linha) for linha in linhas))
+        BlocoImportacao.objects.create(importacao='historico.ndjson', linha_inicial=0, linhas=4)
+
+        for tamanho_bloco in (2, 8):
+            with self.assertRaisesMessage(CommandError, 'outro --tamanho-bloco'):
+                self.importar(caminho, tamanho_bloco=tamanho_bloco)
+        self.assertEqual(Transacao.objects.count(), 0)
+
+        saida, _ = self.importar(caminho, tamanho_bloco=4)
+        self.assertIn('4 linhas gravadas, 0 rejeitadas e 4 já importadas', saida)
+
+    def test_linhas_ndjson_invalidas_sao_rejeitadas(self):
+        """Teste se linhas NDJSON truncadas ou que não são objetos são relatadas como rejeitadas"""
+        caminho = self.escrever('historico.ndjson', (
+            '{"remetente": "ana", "valor": "5.00", "tipo_transacao": "DEPOSITO", "realizado_em": "2023-01-01"}\n'
+            '\n'
+            '{"remetente": "ana", "valor": \n'
+            '[1]\n'
+            '\n'
+            '{"remetente": ["ana"], "valor": "1.00", "tipo_transacao": "DEPOSITO", "realizado_em": "2023-01-01"}\n'
+        ))
+        saida, erros = self.importar(caminho)
+
+        self.assertIn('1 linhas gravadas, 3 rejeitadas', saida)
+        self.assertIn('Linha 3 rejeitada: JSON inválido', erros)  # Linhas do arquivo, contando as em branco
+        self.assertIn('Linha 4 rejeitada: a linha não é um objeto JSON', erros)
+        self.assertIn('Linha 6 rejeitada: usuário não encontrado', erros)
+        self.assertEqual(Carteira.objects.get(usuario__username='ana').saldo, Decimal('5.00'))
@@ -0,0 +1,164 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from carteira.dinheiro import MAXIMO_CENTAVOS
+from carteira.exceptions import LimiteSaldoExcedido, LogCheio, SaldoInsuficiente
+from carteira.livro_razao import TAMANHO_REGISTRO, LivroRazao
+from carteira.models import Carteira, CheckpointLivroRazao, EventoTransacao, Transacao
+from carteira.motores import encerrar_motores, obter_motor
+
+
+# Testes para o livro-razão em memória com WAL
+class LivroRazaoTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.carteira = Carteira.objects.create(usuario=self.user)
+        self.destinatario = User.objects.create_user(username='destinatario', password='testpass123')
+        self.carteira_destinatario = Carteira.objects.create(usuario=self.destinatario)
+
+    def criar_livro(self, **kwargs):
+        livro = LivroRazao(self.diretorio, **kwargs)
+        self.addCleanup(lambda: livro._trava_arquivo.closed or livro.encerrar(descarregar=False))
+        return livro
+
+    def test_operacoes_gravadas_no_banco_apos_descarga(self):
+        """Teste se depósito e transferência só chegam ao banco na descarga, com saldos, transações e eventos"""
+        livro = self.criar_livro()
+        livro.depositar(self.user.pk, 10000)
+        livro.transferir(self.user.pk, self.destinatario.pk, 2550)
+
+        self.assertEqual(livro.saldo(self.user.pk), 7450)
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('0.00'))
+
+        self.assertEqual(livro.descarregar(), 2)
+
+        self.carteira.refresh_from_db()
+        self.carteira_destinatario.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('74.50'))
+        self.assertEqual(self.carteira_destinatario.saldo, Decimal('25.50'))
+        self.assertEqual(
+            (self.carteira.qtd_transacoes, self.carteira.total_entradas, self.carteira.total_saidas),
+            (2, Decimal('100.00'), Decimal('25.50'))
+        )
+        self.assertEqual(self.carteira_destinatario.total_entradas, Decimal('25.50'))
+        self.assertEqual(
+            list(Transacao.objects.order_by('pk').values_list('tipo_transacao', 'valor')),
+            [('DEPOSITO', Decimal('100.00')), ('TRANSFERENCIA', Decimal('25.50'))]
+        )
+        self.assertEqual(EventoTransacao.objects.count(), 2)
+        self.assertEqual(CheckpointLivroRazao.objects.get().ultima_sequencia, 2)
+
+    def test_saldo_insuficiente(self):
+        """Teste se a transferência sem saldo é rejeitada sem registrar nada"""
+        livro = self.criar_livro()
+        with self.assertRaises(SaldoInsuficiente):
+            livro.transferir(self.user.pk, self.destinatario.pk, 1)
+        self.assertEqual(livro.descarregar(), 0)
+
+    def test_limite_do_bigint(self):
+        """Teste se a operação que passaria do BIGINT é recusada antes de ir para o WAL"""
+        livro = self.criar_livro()
+        livro.depositar(self.user.pk, MAXIMO_CENTAVOS - 10)
+        with self.assertRaises(LimiteSaldoExcedido):
+            livro.depositar(self.user.pk, 20)
+        livro.transferir(self.user.pk, self.destinatario.pk, MAXIMO_CENTAVOS - 10)
+        with self.assertRaises(LimiteSaldoExcedido):
+            livro.depositar(self.user.pk, 20)  # O total de entradas também precisa caber
+        self.assertEqual(livro.descarregar(), 2)
+
+    def test_recuperacao_apos_queda(self):
+        """Teste se operações confirmadas e não gravadas no banco são recuperadas do WAL uma única vez"""
+        livro = self.criar_livro()
+        livro.depositar(self.user.pk, 5000)
+        livro.descarregar()
+        livro.transferir(self.user.pk, self.destinatario.pk, 1000)
+        livro.encerrar(descarregar=False)  # Simula a queda do processo antes da descarga
+
+        recuperado = self.criar_livro()
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('40.00'))
+        self.assertEqual(Transacao.objects.count(), 2)
+        recuperado.encerrar()
+
+        # Uma nova inicialização não reaplica o que já está no banco
+        self.criar_livro()
+        self.assertEqual(Transacao.objects.count(), 2)
+
+    def test_troca_de_segmento(self):
+        """Teste se o WAL alterna entre os segmentos e exige a descarga quando ambos têm pendências"""
+        livro = self.criar_livro(tamanho_segmento=2 * TAMANHO_REGISTRO)
+        for _ in range(4):
+            livro.depositar(self.user.pk, 100)
+        with self.assertRaises(LogCheio):
+            livro.depositar(self.user.pk, 100)
+
+        livro.descarregar()
+        livro.depositar(self.user.pk, 100)
+        livro.encerrar(descarregar=False)
+
+        self.criar_livro()
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('5.00'))
+
+    def test_processo_unico(self):
+        """Teste se um segundo livro-razão no mesmo diretório é recusado"""
+        self.criar_livro()
+        with self.assertRaises(ImproperlyConfigured):
+            LivroRazao(self.diretorio)
+
+
+# Testes das views usando o livro-razão como motor
+class LivroRazaoViewsTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio)
+        configuracao = override_settings(
+            CARTEIRA_MOTOR='livro_razao',
+            CARTEIRA_LIVRO_RAZAO={'DIRETORIO': diretorio, 'INTERVALO_DESCARGA': None}
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.addCleanup(encerrar_motores, descarregar=False)
+
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.carteira = Carteira.objects.create(usuario=self.user)
+        self.api_client.force_authenticate(user=self.user)
+        destinatario = User.objects.create_user(username='destinatario', password='testpass123')
+        Carteira.objects.create(usuario=destinatario)
+
+    def test_deposito_e_transferencia_pelo_motor(self):
+        """Teste se as views delegam ao livro-razão e o saldo chega ao banco após a descarga"""
+        response = self.api_client.post(reverse('carteira-deposito'), {'valor': '100.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.api_client.post(
+            reverse('carteira-transferencia'),
+            {'destinatario_username': 'destinatario', 'valor': '150.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['erro'], 'Saldo insuficiente')
+
+        response = self.api_client.post(
+            reverse('carteira-transferencia'),
+            {'destinatario_username': 'destinatario', 'valor': '60.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        obter_motor().descarregar()
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('40.00'))
@@ -0,0 +1,176 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from carteira.destinatarios import cache_destinatarios
+from carteira.dinheiro import MAXIMO_CENTAVOS
+from carteira.exceptions import LimiteSaldoExcedido, SaldoInsuficiente
+from carteira.lote import CoordenadorLote, Operacao, aplicar_lote
+from carteira.models import Carteira, EventoTransacao, Transacao
+from carteira.motores import encerrar_motores
+
+
+# Testes para o group commit de depósitos e transferências
+class AplicarLoteTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.usuarios = [
+            User.objects.create_user(username=f'usuario{indice}', password='testpass123') for indice in range(3)
+        ]
+        self.carteiras = [Carteira.objects.create(usuario=usuario) for usuario in self.usuarios]
+
+    def test_lote_com_resultados_individuais(self):
+        """Teste se um lote aplica as operações em ordem e rejeita apenas a que não tem saldo"""
+        a, b, c = (usuario.pk for usuario in self.usuarios)
+        lote = [
+            Operacao('DEPOSITO', a, a, 10000),
+            Operacao('TRANSFERENCIA', a, b, 6000),
+            Operacao('TRANSFERENCIA', a, c, 6000),  # Sem saldo após a operação anterior
+            Operacao('TRANSFERENCIA', b, c, 1000),
+        ]
+        aplicar_lote(lote)
+
+        self.assertIsNone(lote[1].erro)
+        self.assertIsInstance(lote[2].erro, SaldoInsuficiente)
+        self.assertIsNone(lote[3].erro)
+
+        saldos = [carteira.saldo for carteira in Carteira.objects.order_by('pk')]
+        self.assertEqual(saldos, [Decimal('40.00'), Decimal('50.00'), Decimal('10.00')])
+        contadores = list(
+            Carteira.objects.order_by('pk').values_list('qtd_transacoes', 'total_entradas', 'total_saidas')
+        )
+        self.assertEqual(contadores, [
+            (2, Decimal('100.00'), Decimal('60.00')),
+            (1, Decimal('60.00'), Decimal('10.00')),
+            (0, Decimal('10.00'), Decimal('0.00')),
+        ])
+        self.assertEqual(Transacao.objects.count(), 3)
+        self.assertEqual(EventoTransacao.objects.count(), 3)
+
+    def test_limite_do_bigint(self):
+        """Teste se a operação que levaria o destino além do BIGINT é rejeitada sem afetar as demais"""
+        a, b = (usuario.pk for usuario in self.usuarios[:2])
+        lote = [
+            Operacao('DEPOSITO', a, a, MAXIMO_CENTAVOS - 10),
+            Operacao('DEPOSITO', a, a, 20),
+            Operacao('TRANSFERENCIA', a, b, 100),
+        ]
+        aplicar_lote(lote)
+
+        self.assertIsNone(lote[0].erro)
+        self.assertIsInstance(lote[1].erro, LimiteSaldoExcedido)
+        self.assertIsNone(lote[2].erro)
+        self.assertEqual(Carteira.objects.get(usuario_id=b).saldo, Decimal('1.00'))
+
+    def test_operacoes_concorrentes_no_mesmo_lote(self):
+        """Teste se requisições simultâneas dentro da janela são aplicadas em uma única chamada de aplicar_lote"""
+        coordenador = CoordenadorLote(janela=0.2)
+        barreira = threading.Barrier(len(self.usuarios))
+        erros = []
+
+        def depositar(usuario):
+            try:
+                barreira.wait()
+                coordenador.depositar(usuario.pk, 500)
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        with mock.patch('carteira.lote.aplicar_lote', side_effect=aplicar_lote) as aplicar:
+            threads = [threading.Thread(target=depositar, args=(usuario,)) for usuario in self.usuarios]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertEqual(aplicar.call_count, 1)
+        self.assertEqual(len(aplicar.call_args.args[0]), len(self.usuarios))
+        self.assertEqual(
+            list(Carteira.objects.values_list('saldo', flat=True)), [Decimal('5.00')] * len(self.usuarios)
+        )
+
+    def test_carteira_inexistente(self):
+        """Teste se uma operação para usuário sem carteira falha sem afetar as demais"""
+        sem_carteira = User.objects.create_user(username='semcarteira', password='testpass123')
+        a = self.usuarios[0].pk
+        lote = [Operacao('DEPOSITO', sem_carteira.pk, sem_carteira.pk, 100), Operacao('DEPOSITO', a, a, 100)]
+        aplicar_lote(lote)
+
+        self.assertIsInstance(lote[0].erro, Carteira.DoesNotExist)
+        self.assertIsNone(lote[1].erro)
+        self.assertEqual(Carteira.objects.get(usuario_id=a).saldo, Decimal('1.00'))
+
+
+@override_settings(CARTEIRA_MOTOR='lote', CARTEIRA_LOTE={'JANELA': 0})
+class LoteViewsTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.addCleanup(encerrar_motores)
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.carteira = Carteira.objects.create(usuario=self.user)
+        self.api_client.force_authenticate(user=self.user)
+        self.destinatario = User.objects.create_user(username='destinatario', password='testpass123')
+        Carteira.objects.create(usuario=self.destinatario)
+
+    def test_deposito_e_transferencia_em_lote(self):
+        """Teste se as views delegam ao coordenador e devolvem o resultado de cada operação"""
+        response = self.api_client.post(reverse('carteira-deposito'), {'valor': '100.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.api_client.post(
+            reverse('carteira-transferencia'),
+            {'destinatario_username': 'destinatario', 'valor': '150.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.api_client.post(
+            reverse('carteira-transferencia'),
+            {'destinatario_username': 'destinatario', 'valor': '30.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('70.00'))
+
+    def test_destinatario_consultado_no_banco(self):
+        """Teste se, com o motor, um username renomeado em outro processo não usa a entrada antiga do cache"""
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '100.00'}, format='json')
+        cache_destinatarios.limpar()
+        cache_destinatarios.guardar('destinatario', self.destinatario.pk, 0)
+        outro = User.objects.create_user(username='outro', password='testpass123')
+        Carteira.objects.create(usuario=outro)
+        User.objects.filter(pk=self.destinatario.pk).update(username='antigo')  # Não dispara sinais
+        User.objects.filter(pk=outro.pk).update(username='destinatario')
+
+        response = self.api_client.post(
+            reverse('carteira-transferencia'),
+            {'destinatario_username': 'destinatario', 'valor': '30.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Carteira.objects.get(usuario=outro).saldo, Decimal('30.00'))
+        self.assertEqual(Carteira.objects.get(usuario=self.destinatario).saldo, Decimal('0.00'))
+
+    def test_carteira_removida_antes_do_lote(self):
+        """Teste se a carteira do destinatário removida entre a consulta e o lote resulta em 404"""
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '100.00'}, format='json')
+        sem_carteira = User.objects.create_user(username='semcarteira', password='testpass123')
+        with mock.patch('carteira.views.consultar_destinatario', return_value=(sem_carteira.pk, 0)):
+            response = self.api_client.post(
+                reverse('carteira-transferencia'),
+                {'destinatario_username': 'destinatario', 'valor': '30.00'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['erro'], 'Usuário destinatário não encontrado')
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('100.00'))
@@ -2,6 +2,7 @@ from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import connection
 from carteira.models import Carteira, Transacao
 
 
@@ -41,6 +42,24 @@ class CarteiraModelTest(TestCase):
         except ValidationError:
             self.fail("Não deveria levantar ValidationError para saldo dentro do limite permitido")
 
+    def test_saldo_acima_do_antigo_limite_decimal(self):
+        """Teste se saldos maiores que 99.999.999,99 são armazenados sem perda"""
+        self.carteira.saldo = Decimal('1234567890123.45')
+        self.carteira.full_clean()
+        self.carteira.save()
+
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('1234567890123.45'))
+
+    def test_saldo_armazenado_em_centavos(self):
+        """Teste se o saldo é gravado no banco como inteiro de centavos"""
+        self.carteira.saldo = Decimal('10.25')
+        self.carteira.save()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT saldo FROM carteira_carteira WHERE id = %s', [self.carteira.pk])
+            self.assertEqual(cursor.fetchone()[0], 1025)
+
 
 # Testes para o modelo Transacao
 class TransacaoModelTest(TestCase):
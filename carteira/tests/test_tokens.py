@@ -0,0 +1,65 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from carteira.orcamento import limite_consultas
+
+
+# Testes para emissão, rotação e revogação de tokens
+class TokensTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def login(self):
+        return self.api_client.post(
+            reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpass123'}, format='json'
+        )
+
+    def test_rotacao_revoga_o_refresh_anterior(self):
+        """Teste se o refresh usado na rotação é revogado e recusado, inclusive pelo cache"""
+        refresh = self.login().data['refresh']
+        response = self.api_client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+        for _ in range(2):
+            response = self.api_client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Revogado fica no cache: a recusa não consulta a lista de revogação
+        with limite_consultas(0):
+            response = self.api_client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rehash_ao_mudar_o_custo(self):
+        """Teste se o hash da senha é regravado com o novo custo no login"""
+        self.assertIn('$1000$', self.user.password)
+        with override_settings(SENHA_ITERACOES=1200):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertIn('$1200$', self.user.password)
+
+    def test_limpeza_de_tokens_expirados(self):
+        """Teste se a limpeza remove, em lotes, apenas os tokens expirados e suas revogações"""
+        agora = timezone.now()
+        for indice in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.user, jti=f'expirado{indice}', token='', expires_at=agora - timedelta(days=1)
+            )
+            BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(user=self.user, jti='valido', token='', expires_at=agora + timedelta(days=1))
+
+        saida = StringIO()
+        call_command('limpar_tokens', lote=2, stdout=saida)
+        self.assertIn('5 tokens expirados removidos', saida.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['valido'])
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
@@ -1,9 +1,23 @@
-from django.test import TransactionTestCase
+import json
+import os
+import tempfile
+from unittest import mock
+from io import StringIO
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from datetime import datetime, timezone
 from decimal import Decimal
 from django.urls import reverse
 from rest_framework import status
 from django.contrib.auth.models import User
-from carteira.models import Carteira, Transacao
+from carteira.destinatarios import cache_destinatarios
+from carteira.models import Carteira, Transacao, EventoTransacao
+from carteira.dinheiro import VALOR_MAXIMO
+from carteira.exceptions import OrcamentoExcedido
+from carteira.orcamento import limite_consultas
+from carteira.outbox import montar_evento, publicar_pendentes
+from carteira.perfil import monitor_locks
+from carteira.views import CarteiraViewSet, TransacaoViewSet
 from rest_framework.test import APIClient
 
 
@@ -42,6 +56,47 @@ class UsuarioViewSetTest(TransactionTestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+# Testes para a busca de usuários por prefixo
+class BuscaUsuariosTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        for username in ('Maria', 'mariana', 'marcos', 'joao'):
+            User.objects.create_user(username=username, password='testpass123')
+        User.objects.create_superuser(username='mariadmin', password='testpass123')
+        self.api_client.force_authenticate(user=self.user)
+
+    def test_busca_exige_autenticacao(self):
+        """Teste se a listagem de usuários exige autenticação"""
+        response = APIClient().get(reverse('usuario-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_busca_por_prefixo(self):
+        """Teste se a busca ignora maiúsculas, exclui superusuários e retorna apenas id e username"""
+        response = self.api_client.get(reverse('usuario-list'), {'busca': 'mari'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([usuario['username'] for usuario in response.data['results']], ['Maria', 'mariana'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'username'})
+
+    def test_paginacao_por_cursor(self):
+        """Teste se as páginas seguem pelo cursor sem repetir usuários"""
+        response = self.api_client.get(reverse('usuario-list'), {'limite': 3})
+        primeira = [usuario['username'] for usuario in response.data['results']]
+        response = self.api_client.get(response.data['next'])
+        segunda = [usuario['username'] for usuario in response.data['results']]
+        self.assertEqual(len(primeira), 3)
+        self.assertEqual(sorted(primeira + segunda), sorted(['Maria', 'mariana', 'marcos', 'joao', 'testuser']))
+        self.assertIsNone(response.data['next'])
+
+    def test_cadastro_invalida_cache(self):
+        """Teste se um usuário recém-criado aparece na busca já em cache"""
+        self.api_client.get(reverse('usuario-list'), {'busca': 'mar'})
+        User.objects.create_user(username='marta', password='testpass123')
+        response = self.api_client.get(reverse('usuario-list'), {'busca': 'mar'})
+        self.assertIn('marta', [usuario['username'] for usuario in response.data['results']])
+
+
 # Testes para a Carteira (depósitos e transferências)
 class CarteiraViewSetTest(TransactionTestCase):
     def setUp(self):
@@ -69,6 +124,33 @@ class CarteiraViewSetTest(TransactionTestCase):
         self.carteira.refresh_from_db()
         self.assertEqual(self.carteira.saldo, Decimal('100.00'))
 
+    def test_deposito_valor_grande(self):
+        """Teste depósito acima do antigo limite de 99.999.999,99 mantendo o formato decimal no JSON"""
+        url = reverse('carteira-deposito')
+        response = self.api_client.post(url, {'valor': '500000000000.99'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.api_client.get(reverse('carteira-list'))
+        self.assertEqual(response.data[0]['saldo'], '500000000000.99')
+
+    def test_limite_do_bigint(self):
+        """Teste se depósito ou transferência que levaria o saldo além do BIGINT é rejeitado com 400"""
+        Carteira.objects.filter(pk=self.carteira.pk).update(saldo=VALOR_MAXIMO - Decimal('0.50'))
+        response = self.api_client.post(reverse('carteira-deposito'), {'valor': '1.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        remetente = User.objects.create_user(username='remetente', password='testpass123')
+        Carteira.objects.create(usuario=remetente, saldo=Decimal('10.00'))
+        self.api_client.force_authenticate(user=remetente)
+        response = self.api_client.post(
+            reverse('carteira-transferencia'), {'destinatario_username': 'testuser', 'valor': '1.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, VALOR_MAXIMO - Decimal('0.50'))
+        self.assertEqual(Transacao.objects.count(), 0)
+
     def test_deposito_valor_negativo(self):
         """Teste tentar realizar depósito com valor negativo"""
         url = reverse('carteira-deposito')
@@ -100,6 +182,41 @@ class CarteiraViewSetTest(TransactionTestCase):
         # Verifica se a transferência foi realizada com sucesso
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_transferencia_atualiza_saldos_em_centavos(self):
+        """Teste se a transferência debita e credita o valor exato nas duas carteiras (UPDATE em centavos)"""
+        destinatario = User.objects.create_user(username='destinatario', password='testpass123')
+        Carteira.objects.create(usuario=destinatario)
+        self.carteira.saldo = Decimal('100.00')
+        self.carteira.save()
+
+        response = self.api_client.post(
+            reverse('carteira-transferencia'), {'destinatario_username': 'destinatario', 'valor': '50.01'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.carteira.refresh_from_db()
+        self.assertEqual(self.carteira.saldo, Decimal('49.99'))
+        self.assertEqual(Carteira.objects.get(usuario=destinatario).saldo, Decimal('50.01'))
+
+    def test_contadores_da_carteira(self):
+        """Teste se depósito e transferência atualizam os contadores exibidos no resumo da carteira"""
+        destinatario = User.objects.create_user(username='destinatario', password='testpass123')
+        Carteira.objects.create(usuario=destinatario)
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '100.00'}, format='json')
+        self.api_client.post(
+            reverse('carteira-transferencia'), {'destinatario_username': 'destinatario', 'valor': '30.00'}, format='json'
+        )
+
+        resumo = self.api_client.get(reverse('carteira-list')).data[0]
+        self.assertEqual(
+            (resumo['qtd_transacoes'], resumo['total_entradas'], resumo['total_saidas'], resumo['saldo']),
+            (2, '100.00', '30.00', '70.00')
+        )
+        self.assertEqual(
+            Carteira.objects.values_list('qtd_transacoes', 'total_entradas', 'total_saidas').get(usuario=destinatario),
+            (0, Decimal('30.00'), Decimal('0.00'))
+        )
+
     def test_transferencia_saldo_insuficiente(self):
         """Teste tentar transferir com saldo insuficiente"""
         destinatario = User.objects.create_user(
@@ -122,6 +239,136 @@ class CarteiraViewSetTest(TransactionTestCase):
         self.assertEqual(response.data['erro'], 'Saldo insuficiente')
 
 
+# Testes para o cache de destinatários das transferências
+class CacheDestinatariosTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        cache_destinatarios.limpar()
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Carteira.objects.create(usuario=self.user, saldo=Decimal('100.00'))
+        self.api_client.force_authenticate(user=self.user)
+        self.destinatario = User.objects.create_user(username='loja', password='testpass123')
+        self.carteira_destinatario = Carteira.objects.create(usuario=self.destinatario)
+
+    def transferir(self, username, valor='10.00'):
+        url = reverse('carteira-transferencia')
+        return self.api_client.post(url, {'destinatario_username': username, 'valor': valor}, format='json')
+
+    def test_acertos_e_faltas(self):
+        """Teste se a segunda transferência para o mesmo destinatário usa o cache"""
+        self.assertEqual(self.transferir('loja').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.transferir('loja').status_code, status.HTTP_200_OK)
+        estatisticas = cache_destinatarios.estatisticas()
+        self.assertEqual((estatisticas['acertos'], estatisticas['faltas']), (1, 1))
+        self.assertIsNone(cache_destinatarios.obter('testuser'))  # O remetente não entra no cache
+        self.carteira_destinatario.refresh_from_db()
+        self.assertEqual(self.carteira_destinatario.saldo, Decimal('20.00'))
+
+    def test_renomeacao_invalida_entrada(self):
+        """Teste se renomear o usuário pelo ORM remove a entrada do cache"""
+        self.transferir('loja')
+        self.destinatario.username = 'loja_nova'
+        self.destinatario.save()
+        self.assertIsNone(cache_destinatarios.obter('loja'))
+        self.assertEqual(self.transferir('loja').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_entrada_desatualizada_em_outro_processo(self):
+        """Teste se uma renomeação sem sinal (ex.: outro processo) é detectada ao travar as carteiras"""
+        self.transferir('loja')
+        outro = User.objects.create_user(username='outro', password='testpass123')
+        Carteira.objects.create(usuario=outro)
+        User.objects.filter(pk=self.destinatario.pk).update(username='loja_antiga')  # Não dispara sinais
+        User.objects.filter(pk=outro.pk).update(username='loja')
+
+        self.assertEqual(self.transferir('loja').status_code, status.HTTP_200_OK)
+        self.assertEqual(Carteira.objects.get(usuario=outro).saldo, Decimal('10.00'))
+        self.carteira_destinatario.refresh_from_db()
+        self.assertEqual(self.carteira_destinatario.saldo, Decimal('10.00'))
+
+    def test_entrada_desatualizada_conferida_antes_dos_locks(self):
+        """Teste se a carteira antiga de uma entrada desatualizada não é travada, só as duas válidas, em ordem"""
+        self.transferir('loja')
+        outro = User.objects.create_user(username='outro', password='testpass123')
+        carteira_outro = Carteira.objects.create(usuario=outro)
+        User.objects.filter(pk=self.destinatario.pk).update(username='loja_antiga')  # Não dispara sinais
+        User.objects.filter(pk=outro.pk).update(username='loja')
+
+        with mock.patch.object(monitor_locks, 'registrar', wraps=monitor_locks.registrar) as registrar:
+            self.assertEqual(self.transferir('loja').status_code, status.HTTP_200_OK)
+        carteira_remetente = Carteira.objects.get(usuario=self.user)
+        self.assertEqual(
+            [chamada.args[0] for chamada in registrar.call_args_list],
+            [[pk] for pk in sorted([carteira_remetente.pk, carteira_outro.pk])]
+        )
+
+    def test_remetente_sem_carteira(self):
+        """Teste se o remetente sem carteira recebe 404 da própria carteira, não do destinatário"""
+        Carteira.objects.filter(usuario=self.user).delete()
+        response = self.transferir('loja')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['erro'], 'Carteira não encontrada')
+
+    def test_diagnostico_somente_admin(self):
+        """Teste se as estatísticas do cache são restritas a administradores"""
+        url = reverse('diagnostico-destinatarios')
+        self.assertEqual(self.api_client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.api_client.force_authenticate(user=admin)
+        response = self.api_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('taxa_acerto', response.data)
+
+
+# Testes para o perfil de locks e de transações lentas
+class PerfilLocksTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        monitor_locks.limpar()
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.carteira = Carteira.objects.create(usuario=self.user, saldo=Decimal('100.00'))
+        self.api_client.force_authenticate(user=self.user)
+        self.carteira_loja = Carteira.objects.create(
+            usuario=User.objects.create_user(username='loja', password='testpass123')
+        )
+
+    def transferir(self):
+        url = reverse('carteira-transferencia')
+        return self.api_client.post(url, {'destinatario_username': 'loja', 'valor': '1.00'}, format='json')
+
+    def test_relatorio_de_carteiras_disputadas(self):
+        """Teste se os locks das transferências aparecem no relatório, da carteira mais disputada para a menos"""
+        self.transferir()
+        self.transferir()
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '1.00'}, format='json')
+
+        admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.api_client.force_authenticate(user=admin)
+        response = self.api_client.get(reverse('diagnostico-locks'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        locks = {carteira['carteira_id']: carteira['locks'] for carteira in response.data['carteiras']}
+        self.assertEqual(locks, {self.carteira.pk: 3, self.carteira_loja.pk: 2})
+
+    def test_espera_registrada_por_carteira(self):
+        """Teste se a transferência trava cada carteira em uma consulta, em ordem de id, sem dividir a espera"""
+        with mock.patch.object(monitor_locks, 'registrar', wraps=monitor_locks.registrar) as registrar:
+            self.assertEqual(self.transferir().status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [chamada.args[0] for chamada in registrar.call_args_list],
+            [[carteira.pk] for carteira in sorted([self.carteira, self.carteira_loja], key=lambda c: c.pk)]
+        )
+
+    @override_settings(CARTEIRA_PERFIL={'LIMITE_TRANSACAO_LENTA': 0})
+    def test_transacao_lenta_no_log(self):
+        """Teste se uma transação acima do limite é registrada com a linha do tempo das consultas"""
+        with self.assertLogs('carteira.perfil', level='WARNING') as logs:
+            self.assertEqual(self.transferir().status_code, status.HTTP_200_OK)
+        self.assertIn('Transação lenta em transferencia', logs.output[0])
+        self.assertIn('UPDATE', logs.output[0])
+
+
 # Testes para a visualização de transações
 class TransacaoViewSetTest(TransactionTestCase):
     def setUp(self):
@@ -159,6 +406,23 @@ class TransacaoViewSetTest(TransactionTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
 
+    def test_paginacao_com_total_do_contador(self):
+        """Teste se a paginação opcional usa o contador da carteira como total, sem COUNT(*)"""
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '10.00'}, format='json')
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '20.00'}, format='json')
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '30.00'}, format='json')
+
+        with limite_consultas(2) as contador:
+            response = self.api_client.get(reverse('transacao-list'), {'tamanho': 2})
+        self.assertFalse(any('COUNT' in sql for sql in contador.consultas))
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+        # Com filtros o total depende da consulta e volta a ser contado no banco
+        response = self.api_client.get(reverse('transacao-list'), {'tamanho': 2, 'tipo': 'TRANSFERENCIA'})
+        self.assertEqual(response.data['count'], 0)
+
     def test_filtrar_transacoes_por_tipo(self):
         """Teste filtrar transações por tipo"""
         # Criar transações de diferentes tipos
@@ -186,3 +450,293 @@ class TransacaoViewSetTest(TransactionTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['tipo_transacao'], 'DEPOSITO')
+
+
+# Testes para o histórico de saldo agregado por período
+class HistoricoSaldoTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.api_client = APIClient()
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.carteira = Carteira.objects.create(usuario=self.user)
+        self.api_client.force_authenticate(user=self.user)
+
+        self.outro = User.objects.create_user(
+            username='outro',
+            password='testpass123'
+        )
+        Carteira.objects.create(usuario=self.outro)
+
+    def criar_transacao(self, remetente, destinatario, valor, tipo, data):
+        """Cria uma transação e ajusta a data de realização"""
+        transacao = Transacao.objects.create(
+            remetente=remetente,
+            destinatario=destinatario,
+            valor=Decimal(valor),
+            tipo_transacao=tipo
+        )
+        Transacao.objects.filter(pk=transacao.pk).update(
+            realizado_em=datetime(*data, 12, tzinfo=timezone.utc)
+        )
+
+    def test_saldo_acumulado_por_dia(self):
+        """Teste se o saldo acumulado considera depósitos, envios, recebimentos e o saldo anterior ao intervalo"""
+        self.criar_transacao(self.user, self.user, '100.00', 'DEPOSITO', (2024, 1, 1))
+        self.criar_transacao(self.user, self.outro, '30.00', 'TRANSFERENCIA', (2024, 1, 2))
+        self.criar_transacao(self.outro, self.user, '10.00', 'TRANSFERENCIA', (2024, 1, 2))
+        self.criar_transacao(self.user, self.user, '5.00', 'DEPOSITO', (2024, 1, 4))
+
+        url = reverse('carteira-historico-saldo')
+        response = self.api_client.get(url, {'inicio': '2024-01-02', 'fim': '2024-01-31'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(p['periodo'], p['variacao'], p['saldo']) for p in response.data],
+            [('2024-01-02', '-20.00', '80.00'), ('2024-01-04', '5.00', '85.00')]
+        )
+
+    def test_saldo_acumulado_por_mes(self):
+        """Teste o agrupamento mensal"""
+        self.criar_transacao(self.user, self.user, '100.00', 'DEPOSITO', (2024, 1, 10))
+        self.criar_transacao(self.user, self.user, '50.00', 'DEPOSITO', (2024, 1, 20))
+        self.criar_transacao(self.user, self.outro, '25.00', 'TRANSFERENCIA', (2024, 2, 5))
+
+        url = reverse('carteira-historico-saldo')
+        response = self.api_client.get(url, {'inicio': '2024-01-01', 'fim': '2024-02-29', 'agrupamento': 'mes'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(p['periodo'], p['saldo']) for p in response.data],
+            [('2024-01-01', '150.00'), ('2024-02-01', '125.00')]
+        )
+
+    def test_cache_invalidado_apos_deposito(self):
+        """Teste se um novo depósito invalida a série em cache"""
+        url = reverse('carteira-historico-saldo')
+        self.assertEqual(self.api_client.get(url).data, [])
+
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '40.00'}, format='json')
+
+        response = self.api_client.get(url)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['saldo'], '40.00')
+
+    def test_cache_compartilhado_entre_processos(self):
+        """Teste se uma transação gravada por outro processo (sem passar por este) muda a chave do cache"""
+        url = reverse('carteira-historico-saldo')
+        self.assertEqual(self.api_client.get(url).data, [])
+
+        # Mesmo efeito no banco de um depósito atendido por outro worker
+        Transacao.objects.create(
+            remetente=self.user, destinatario=self.user, valor=Decimal('15.00'), tipo_transacao='DEPOSITO'
+        )
+        Carteira.objects.filter(pk=self.carteira.pk).update(
+            saldo=Decimal('15.00'), qtd_transacoes=1, total_entradas=Decimal('15.00')
+        )
+
+        response = self.api_client.get(url)
+        self.assertEqual([p['saldo'] for p in response.data], ['15.00'])
+
+    def test_intervalo_invalido(self):
+        """Teste se início posterior ao fim ou datas nos extremos do calendário retornam 400"""
+        url = reverse('carteira-historico-saldo')
+        response = self.api_client.get(url, {'inicio': '2024-02-01', 'fim': '2024-01-01'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for parametros in ({'fim': '9999-12-31'}, {'inicio': '0001-01-01', 'fim': '2024-01-01'}, {'fim': '0001-01-15'}):
+            response = self.api_client.get(url, parametros)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, parametros)
+
+
+# Sink em memória: guarda os eventos entregues pelo relay
+class ListaSink:
+    def __init__(self):
+        self.eventos = []
+
+    def enviar(self, eventos):
+        self.eventos.extend(eventos)
+
+
+# Testes para o outbox de eventos e o feed por cursor
+class EventoViewSetTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.api_client = APIClient()
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.carteira = Carteira.objects.create(usuario=self.user)
+        self.api_client.force_authenticate(user=self.user)
+
+        self.destinatario = User.objects.create_user(
+            username='destinatario',
+            password='testpass123'
+        )
+        Carteira.objects.create(usuario=self.destinatario)
+
+    def test_operacoes_gravam_eventos(self):
+        """Teste se depósito e transferência gravam um evento cada no outbox"""
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '100.00'}, format='json')
+        self.api_client.post(
+            reverse('carteira-transferencia'),
+            {'destinatario_username': 'destinatario', 'valor': '40.00'},
+            format='json'
+        )
+
+        eventos = list(EventoTransacao.objects.order_by('pk'))
+        self.assertEqual([e.tipo_evento for e in eventos], ['deposito.realizado', 'transferencia.realizada'])
+        self.assertEqual(eventos[1].payload['destinatario'], 'destinatario')
+        self.assertEqual(eventos[1].payload['valor'], '40.00')
+
+    def test_feed_por_cursor(self):
+        """Teste se o feed retorna apenas eventos publicados após o cursor e devolve o próximo cursor"""
+        url = reverse('evento-list')
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '10.00'}, format='json')
+        self.assertEqual(self.api_client.get(url).data['eventos'], [])  # Ainda não publicado pelo relay
+        publicar_pendentes(ListaSink(), 100)
+
+        primeira = self.api_client.get(url)
+        self.assertEqual(primeira.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(primeira.data['eventos']), 1)
+
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '20.00'}, format='json')
+        publicar_pendentes(ListaSink(), 100)
+
+        segunda = self.api_client.get(url, {'cursor': primeira.data['cursor']})
+        self.assertEqual(len(segunda.data['eventos']), 1)
+        self.assertEqual(segunda.data['eventos'][0]['payload']['valor'], '20.00')
+
+        # Sem novos eventos, o cursor é mantido
+        terceira = self.api_client.get(url, {'cursor': segunda.data['cursor']})
+        self.assertEqual(terceira.data, {'eventos': [], 'cursor': segunda.data['cursor']})
+
+    def test_feed_filtra_eventos_de_outros_usuarios(self):
+        """Teste se um usuário comum não vê eventos de transações das quais não participa"""
+        outro_client = APIClient()
+        outro_client.force_authenticate(user=self.destinatario)
+        outro_client.post(reverse('carteira-deposito'), {'valor': '10.00'}, format='json')
+        publicar_pendentes(ListaSink(), 100)
+
+        response = self.api_client.get(reverse('evento-list'))
+        self.assertEqual(response.data['eventos'], [])
+
+    def test_evento_com_commit_atrasado_nao_fica_atras_do_cursor(self):
+        """Teste se um evento com id menor que o já entregue, visível depois, ainda é entregue após o cursor"""
+        def criar_evento(pk, valor):
+            transacao = Transacao.objects.create(
+                remetente=self.user, destinatario=self.user, valor=Decimal(valor), tipo_transacao='DEPOSITO'
+            )
+            evento = montar_evento(transacao)
+            evento.pk = pk
+            evento.save()
+
+        url = reverse('evento-list')
+        criar_evento(100, '10.00')
+        publicar_pendentes(ListaSink(), 100)
+        cursor = self.api_client.get(url).data['cursor']
+
+        criar_evento(50, '20.00')  # INSERT anterior cujo commit só terminou agora
+        publicar_pendentes(ListaSink(), 100)
+
+        response = self.api_client.get(url, {'cursor': cursor})
+        self.assertEqual([evento['payload']['valor'] for evento in response.data['eventos']], ['20.00'])
+        self.assertGreater(response.data['cursor'], cursor)
+
+    @override_settings(CARTEIRA_OUTBOX={'LONG_POLL_MAX': 0.2, 'LONG_POLL_INTERVALO': 0.1})
+    def test_long_polling_limitado(self):
+        """Teste se o long-polling para em LONG_POLL_MAX, com uma consulta por LONG_POLL_INTERVALO mais a inicial"""
+        with limite_consultas(3, 'long-polling') as contador:
+            response = self.api_client.get(reverse('evento-list'), {'aguardar': 30})
+        self.assertEqual(response.data['eventos'], [])
+        self.assertEqual(len(contador.consultas), 3)
+
+    def test_relay_entrega_eventos_no_sink(self):
+        """Teste se o relay entrega os eventos pendentes no arquivo e os marca como publicados"""
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '10.00'}, format='json')
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '20.00'}, format='json')
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'eventos.ndjson')
+            with override_settings(CARTEIRA_OUTBOX={'SINK_OPCOES': {'caminho': caminho}}):
+                call_command('relay_eventos', '--lote', '1', stdout=StringIO())
+
+            with open(caminho, encoding='utf-8') as arquivo:
+                linhas = [json.loads(linha) for linha in arquivo]
+
+        self.assertEqual([linha['valor'] for linha in linhas], ['10.00', '20.00'])
+        self.assertFalse(EventoTransacao.objects.filter(publicado_em__isnull=True).exists())
+
+    def test_sink_recebe_sequencia_do_feed(self):
+        """Teste se cada linha do arquivo traz a sequência que o feed usa como cursor"""
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '10.00'}, format='json')
+        self.api_client.post(reverse('carteira-deposito'), {'valor': '20.00'}, format='json')
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'eventos.ndjson')
+            with override_settings(CARTEIRA_OUTBOX={'SINK_OPCOES': {'caminho': caminho}}):
+                call_command('relay_eventos', stdout=StringIO())
+
+            with open(caminho, encoding='utf-8') as arquivo:
+                linhas = [json.loads(linha) for linha in arquivo]
+
+        feed = self.api_client.get(reverse('evento-list')).data['eventos']
+        self.assertEqual(
+            [(linha['sequencia'], linha['valor']) for linha in linhas],
+            [(evento['sequencia'], evento['payload']['valor']) for evento in feed]
+        )
+
+
+# Testes para o orçamento de consultas SQL dos endpoints
+class OrcamentoConsultasTest(TransactionTestCase):
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Carteira.objects.create(usuario=self.user, saldo=Decimal('100.00'))
+        self.api_client.force_authenticate(user=self.user)
+        destinatario = User.objects.create_user(username='loja', password='testpass123')
+        Carteira.objects.create(usuario=destinatario)
+        Transacao.objects.bulk_create([
+            Transacao(remetente=self.user, destinatario=destinatario, valor=Decimal('1.00'), tipo_transacao='TRANSFERENCIA')
+            for _ in range(10)
+        ])
+
+    def test_listagens_sem_consulta_por_linha(self):
+        """Teste se as listagens fazem uma única consulta, independentemente da quantidade de linhas"""
+        with limite_consultas(1, 'transacoes'):
+            response = self.api_client.get(reverse('transacao-list'))
+        self.assertEqual(len(response.data), 10)
+        with limite_consultas(1, 'carteiras'):
+            self.api_client.get(reverse('carteira-list'))
+
+    def test_operacoes_dentro_do_orcamento(self):
+        """Teste se depósito e transferência ficam dentro do orçamento declarado (sem a consulta do JWT)"""
+        orcamentos = CarteiraViewSet.orcamento_consultas
+        with limite_consultas(orcamentos['deposito'] - 1, 'deposito'):
+            self.api_client.post(reverse('carteira-deposito'), {'valor': '10.00'}, format='json')
+        with limite_consultas(orcamentos['transferencia'] - 1, 'transferencia'):
+            self.api_client.post(
+                reverse('carteira-transferencia'), {'destinatario_username': 'loja', 'valor': '10.00'}, format='json'
+            )
+
+    def test_middleware_estrito_falha_acima_do_orcamento(self):
+        """Teste se o middleware levanta OrcamentoExcedido no modo estrito usado nos testes"""
+        with mock.patch.object(TransacaoViewSet, 'orcamento_consultas', {'list': 0}):
+            with self.assertRaises(OrcamentoExcedido):
+                self.api_client.get(reverse('transacao-list'))
+
+    @override_settings(CARTEIRA_ORCAMENTO={'ATIVO': True, 'ESTRITO': False})
+    def test_middleware_avisa_no_log(self):
+        """Teste se, fora do modo estrito, o excesso vira um aviso com as consultas executadas"""
+        with mock.patch.object(TransacaoViewSet, 'orcamento_consultas', {'list': 0}):
+            with self.assertLogs('carteira.orcamento', level='WARNING') as logs:
+                response = self.api_client.get(reverse('transacao-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('GET /api/transacoes/: 1 consultas SQL, orçamento de 0', logs.output[0])
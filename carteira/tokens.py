@@ -0,0 +1,60 @@
+"""
+Refresh token com a lista de revogação (token_blacklist) mais barata de consultar.
+
+Tokens revogados ficam no cache até expirarem. Só o resultado positivo vai para
+o cache: um token pode ser revogado a qualquer momento em outro processo, então
+"não revogado" sempre é confirmado no banco. Ao registrar um token, o usuário é
+referenciado pelo id do payload, sem buscar o usuário de novo (o refresh já o
+validou). Os serializers daqui são configurados em SIMPLE_JWT.
+"""
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+
+def _chave_revogado(jti):
+    return f'token_revogado:{jti}'
+
+
+class RefreshTokenCarteira(RefreshToken):
+    def _segundos_restantes(self):
+        return max(1, int((datetime_from_epoch(self.payload['exp']) - aware_utcnow()).total_seconds()))
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if cache.get(_chave_revogado(jti)):
+            raise TokenError(_("Token is blacklisted"))
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            cache.set(_chave_revogado(jti), True, self._segundos_restantes())
+            raise TokenError(_("Token is blacklisted"))
+
+    def outstand(self):
+        return OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM],
+            defaults={
+                'user_id': self.payload.get(api_settings.USER_ID_CLAIM),
+                'created_at': self.current_time,
+                'token': str(self),
+                'expires_at': datetime_from_epoch(self.payload['exp']),
+            },
+        )
+
+    def blacklist(self):
+        token, _ = self.outstand()
+        revogado = BlacklistedToken.objects.get_or_create(token=token)
+        cache.set(_chave_revogado(token.jti), True, self._segundos_restantes())
+        return revogado
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    token_class = RefreshTokenCarteira
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    token_class = RefreshTokenCarteira
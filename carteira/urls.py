@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UsuarioViewSet, CarteiraViewSet, TransacaoViewSet
+from .views import UsuarioViewSet, CarteiraViewSet, TransacaoViewSet, EventoViewSet, DiagnosticoViewSet
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet, basename='usuario') #Criação de usuários
 router.register(r'carteiras', CarteiraViewSet, basename='carteira') #Gerenciamento de carteiras
 router.register(r'transacoes', TransacaoViewSet, basename='transacao') #Histórico de transações
+router.register(r'eventos', EventoViewSet, basename='evento') #Feed de eventos (outbox) por cursor
+router.register(r'diagnostico', DiagnosticoViewSet, basename='diagnostico') #Indicadores internos (somente admin)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,34 +1,89 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from django_filters import rest_framework as filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from functools import partial
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
 from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, When
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Carteira, Transacao
+from .destinatarios import cache_destinatarios, consultar_destinatario, resolver_destinatario, travar_carteiras
+from .dinheiro import cabe_no_limite, para_centavos
+from .diretorio import consultar_usuarios, obter_pagina
+from .exceptions import LimiteSaldoExcedido, RemetenteSemCarteira, SaldoInsuficiente
+from .motores import obter_motor
 from .serializers import (
     UsuarioSerializer,
+    BuscaUsuariosSerializer,
     CarteiraSerializer,
     TransacaoSerializer,
     TransferenciaSerializer,
-    DepositoSerializer
+    DepositoSerializer,
+    HistoricoSaldoSerializer,
+    SerieSaldoSerializer,
+    FeedEventosSerializer,
+    EventoTransacaoSerializer
 )
+from .historico import obter_serie_saldo
+from .outbox import buscar_eventos, registrar_evento
+from .perfil import monitor_locks, perfilar_transacao, travar
 
-# Função responsável pelo cadastro de usuários
-class UsuarioViewSet(viewsets.ModelViewSet):
+# Se a carteira travada pode receber mais `centavos` sem o saldo ou o total de entradas passar do BIGINT
+def carteira_comporta(carteira, centavos):
+    return (cabe_no_limite(para_centavos(carteira.saldo), centavos)
+            and cabe_no_limite(para_centavos(carteira.total_entradas), centavos))
+
+def resposta_limite_saldo():
+    return Response(
+        {'erro': 'O valor ultrapassa o saldo máximo permitido para a carteira'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+# Paginação por cursor do diretório de usuários: custo constante mesmo nas páginas finais
+class DiretorioUsuariosPagination(CursorPagination):
+    ordering = 'username'  # Único, então o cursor nunca repete nem pula usuários
+    page_size = 20
+    page_size_query_param = 'limite'
+    max_page_size = 100
+
+# Função responsável pelo cadastro e pela busca de usuários
+class UsuarioViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+    orcamento_consultas = {'create': 3, 'list': 2}  # Máximo de comandos SQL por ação (ver orcamento.py)
     queryset = User.objects.all()
     serializer_class = UsuarioSerializer
-    permission_classes = [AllowAny]  # Permite acesso público (qualquer um pode criar um usuário, pode ser alterado)
-    http_method_names = ['post']  # Restringe a API para permitir apenas a criação de usuários (POST)
+    pagination_class = DiretorioUsuariosPagination
+
+    # Cadastro é público (qualquer um pode criar um usuário); a busca exige autenticação
+    def get_permissions(self):
+        if self.action == 'create':
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    # Lista id e username dos usuários (sem superusuários), com busca por prefixo em ?busca=
+    def list(self, request):
+        serializer = BuscaUsuariosSerializer(data=request.query_params)
+        if serializer.is_valid():
+            busca = serializer.validated_data['busca']
+            dados = obter_pagina(
+                request.build_absolute_uri(),
+                lambda: self.get_paginated_response(self.paginate_queryset(consultar_usuarios(busca))).data
+            )
+            return Response(dados)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # Função responsável por exibir o saldo da carteira e realizar transações
 class CarteiraViewSet(viewsets.ReadOnlyModelViewSet):
+    orcamento_consultas = {'list': 2, 'retrieve': 2, 'deposito': 5, 'transferencia': 9, 'historico_saldo': 4}
     serializer_class = CarteiraSerializer
 
     # Retorna apenas a carteira do usuário autenticado
     def get_queryset(self):
-        return Carteira.objects.filter(usuario=self.request.user)
+        return Carteira.objects.filter(usuario=self.request.user).select_related('usuario')
 
     # Endpoint para depósito de dinheiro na carteira
     @action(detail=False, methods=['post'])
@@ -36,20 +91,37 @@ class CarteiraViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = DepositoSerializer(data=request.data)
         if serializer.is_valid():
             valor = serializer.validated_data['valor']
+            centavos = para_centavos(valor)  # Toda a aritmética de saldo é feita em centavos inteiros
+
+            # Com um motor alternativo configurado (ex.: livro-razão em memória), a operação é delegada a ele
+            motor = obter_motor()
+            if motor is not None:
+                try:
+                    motor.depositar(request.user.pk, centavos)
+                except LimiteSaldoExcedido:
+                    return resposta_limite_saldo()
+                return Response({'mensagem': 'Depósito realizado com sucesso'})
 
-            # Utiliza uma transação atômica para garantir consistência dos dados
-            with transaction.atomic():
-                carteira = Carteira.objects.select_for_update().get(usuario=request.user)
-                carteira.saldo += valor
-                carteira.save()
+            # Utiliza uma transação atômica para garantir consistência dos dados (perfilada: locks e consultas lentas)
+            with perfilar_transacao('deposito'), transaction.atomic():
+                carteira = travar(Carteira.objects.select_for_update().filter(usuario=request.user))[0]
+                if not carteira_comporta(carteira, centavos):
+                    return resposta_limite_saldo()
+                Carteira.objects.filter(pk=carteira.pk).update(
+                    saldo=F('saldo') + centavos,
+                    qtd_transacoes=F('qtd_transacoes') + 1,  # Contadores na mesma UPDATE do saldo
+                    total_entradas=F('total_entradas') + centavos,
+                    atualizado_em=timezone.now()
+                )
 
-                # Registra a transação de depósito
-                Transacao.objects.create(
+                # Registra a transação de depósito e o evento de outbox no mesmo bloco atômico
+                transacao = Transacao.objects.create(
                     remetente=request.user,
                     destinatario=request.user,  # No caso de depósito, remetente e destinatário são o próprio usuário
                     valor=valor,
                     tipo_transacao='DEPOSITO'
                 )
+                registrar_evento(transacao)
 
             return Response({'mensagem': 'Depósito realizado com sucesso'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -60,28 +132,71 @@ class CarteiraViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = TransferenciaSerializer(data=request.data)
         if serializer.is_valid():
             valor = serializer.validated_data['valor']
+            centavos = para_centavos(valor)
             destinatario_username = serializer.validated_data['destinatario_username']
 
-            # Verifica se o destinatário existe
+            # Resolve o destinatário pelo cache de usernames (uma consulta a menos por transferência). Os motores
+            # recebem só o id do usuário e não conferem o username no lock, então com eles a consulta vai ao banco
+            motor = obter_motor()
             try:
-                destinatario = User.objects.get(username=destinatario_username)
-            except User.DoesNotExist:
+                if motor is not None:
+                    destinatario_id, destinatario_carteira_id = consultar_destinatario(destinatario_username)
+                else:
+                    destinatario_id, destinatario_carteira_id = resolver_destinatario(destinatario_username)
+            except Carteira.DoesNotExist:
                 return Response(
                     {'erro': 'Usuário destinatário não encontrado'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
             # Impede transferências para si mesmo
-            if destinatario == request.user:
+            if destinatario_id == request.user.pk:
                 return Response(
                     {'erro': 'Não é possível transferir para si mesmo'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            if motor is not None:
+                try:
+                    motor.transferir(request.user.pk, destinatario_id, centavos)
+                except Carteira.DoesNotExist:
+                    return Response(
+                        {'erro': 'Usuário destinatário não encontrado'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+                except SaldoInsuficiente:
+                    return Response(
+                        {'erro': 'Saldo insuficiente'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                except LimiteSaldoExcedido:
+                    return resposta_limite_saldo()
+                return Response({'mensagem': 'Transferência realizada com sucesso'})
+
             # Transação atômica para garantir consistência dos saldos
-            with transaction.atomic():
-                remetente_carteira = Carteira.objects.select_for_update().get(usuario=request.user)
-                destinatario_carteira = Carteira.objects.select_for_update().get(usuario=destinatario)
+            with perfilar_transacao('transferencia'), transaction.atomic():
+                # Trava as duas carteiras, conferindo o destinatário resolvido pelo cache
+                try:
+                    remetente_carteira, destinatario_carteira = travar_carteiras(
+                        request.user, destinatario_username, destinatario_id, destinatario_carteira_id
+                    )
+                except Carteira.DoesNotExist:
+                    return Response(
+                        {'erro': 'Usuário destinatário não encontrado'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+                except RemetenteSemCarteira:
+                    return Response(
+                        {'erro': 'Carteira não encontrada'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+
+                # O username pode ter passado a ser do próprio remetente entre a resolução e o lock
+                if destinatario_carteira.pk == remetente_carteira.pk:
+                    return Response(
+                        {'erro': 'Não é possível transferir para si mesmo'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
                 # Verifica se há saldo suficiente
                 if remetente_carteira.saldo < valor:
@@ -90,24 +205,56 @@ class CarteiraViewSet(viewsets.ReadOnlyModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
 
-                # Lógica que deduz o valor do saldo do remetente e adiciona ao saldo do destinatário
-                remetente_carteira.saldo -= valor
-                destinatario_carteira.saldo += valor
+                # E se o saldo e o total de entradas do destinatário continuam cabendo no BIGINT
+                if not carteira_comporta(destinatario_carteira, centavos):
+                    return resposta_limite_saldo()
 
-                remetente_carteira.save()
-                destinatario_carteira.save()
+                # Deduz o valor do remetente e adiciona ao destinatário em uma única UPDATE, em centavos,
+                # junto com os contadores: a transferência entra no histórico do remetente
+                Carteira.objects.filter(pk__in=[remetente_carteira.pk, destinatario_carteira.pk]).update(
+                    saldo=Case(
+                        When(pk=remetente_carteira.pk, then=F('saldo') - centavos),
+                        default=F('saldo') + centavos
+                    ),
+                    qtd_transacoes=Case(
+                        When(pk=remetente_carteira.pk, then=F('qtd_transacoes') + 1),
+                        default=F('qtd_transacoes'),
+                        output_field=BigIntegerField()
+                    ),
+                    total_saidas=Case(
+                        When(pk=remetente_carteira.pk, then=F('total_saidas') + centavos),
+                        default=F('total_saidas'),
+                        output_field=BigIntegerField()
+                    ),
+                    total_entradas=Case(
+                        When(pk=remetente_carteira.pk, then=F('total_entradas')),
+                        default=F('total_entradas') + centavos,
+                        output_field=BigIntegerField()
+                    ),
+                    atualizado_em=timezone.now()
+                )
 
-                # Registra a transação de transferência
-                Transacao.objects.create(
-                    remetente=request.user,
-                    destinatario=destinatario,
+                # Registra a transação de transferência e o evento de outbox
+                transacao = Transacao.objects.create(
+                    remetente=remetente_carteira.usuario,
+                    destinatario=destinatario_carteira.usuario,
                     valor=valor,
                     tipo_transacao='TRANSFERENCIA'
                 )
+                registrar_evento(transacao)
 
             return Response({'mensagem': 'Transferência realizada com sucesso'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # Endpoint com a evolução do saldo por dia, semana ou mês, calculada no banco
+    @action(detail=False, methods=['get'], url_path='historico-saldo')
+    def historico_saldo(self, request):
+        serializer = HistoricoSaldoSerializer(data=request.query_params)
+        if serializer.is_valid():
+            serie = obter_serie_saldo(request.user, **serializer.validated_data)
+            return Response(SerieSaldoSerializer(serie, many=True).data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 # Filtro para consultas de transações por data e tipo
 class TransacaoFilter(filters.FilterSet):
     data_inicio = filters.DateTimeFilter(field_name='realizado_em', lookup_expr='gte')
@@ -118,11 +265,33 @@ class TransacaoFilter(filters.FilterSet):
         model = Transacao
         fields = ['tipo_transacao', 'realizado_em']
 
+# Paginador que recebe o total pronto em vez de executar COUNT(*) na consulta
+class PaginatorContagemConhecida(Paginator):
+    def __init__(self, object_list, per_page, contagem=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if contagem is not None:
+            self.count = contagem  # Substitui a cached_property que faria o COUNT(*)
+
+# Paginação opcional do histórico (?tamanho=); sem filtros, o total vem do contador da carteira
+class PaginacaoTransacoes(PageNumberPagination):
+    page_size = None  # Sem ?tamanho= a lista continua completa, como antes
+    page_size_query_param = 'tamanho'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.get_page_size(request) is None:
+            return None
+        contagem = view.contagem_conhecida() if view is not None else None
+        self.django_paginator_class = partial(PaginatorContagemConhecida, contagem=contagem)
+        return super().paginate_queryset(queryset, request, view)
+
 # Função para exibição de transações
 class TransacaoViewSet(viewsets.ReadOnlyModelViewSet):
+    orcamento_consultas = {'list': 3, 'retrieve': 2}
     serializer_class = TransacaoSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = TransacaoFilter
+    pagination_class = PaginacaoTransacoes
     ordering_fields = ['realizado_em', 'valor']
     ordering = ['-realizado_em']  # Ordenação padrão, mais recente primeiro
 
@@ -130,4 +299,42 @@ class TransacaoViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return Transacao.objects.filter(
             remetente=self.request.user
-        ).order_by('-realizado_em')
+        ).select_related('remetente', 'destinatario').order_by('-realizado_em')  # Usernames sem uma consulta por linha
+
+    # Total do histórico sem filtros, lido do contador da carteira (None faz o paginador usar COUNT)
+    def contagem_conhecida(self):
+        if any(filtro in self.request.query_params for filtro in self.filterset_class.base_filters):
+            return None
+        return Carteira.objects.filter(usuario=self.request.user).values_list('qtd_transacoes', flat=True).first()
+
+# Feed de eventos de transações para consumidores externos, paginado por cursor
+class EventoViewSet(viewsets.ViewSet):
+    # JWT e a página, repetida no long-polling a cada LONG_POLL_INTERVALO por até LONG_POLL_MAX (padrão: 10 / 1 s)
+    orcamento_consultas = {'list': 12}
+
+    # Retorna os eventos após o cursor, aguardando novos eventos por até "aguardar" segundos
+    def list(self, request):
+        serializer = FeedEventosSerializer(data=request.query_params)
+        if serializer.is_valid():
+            cursor = serializer.validated_data['cursor']
+            eventos = buscar_eventos(request.user, **serializer.validated_data)
+            return Response({
+                'eventos': EventoTransacaoSerializer(eventos, many=True).data,
+                'cursor': eventos[-1].sequencia if eventos else cursor,  # Valor a ser enviado na próxima consulta
+            })
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+# Indicadores internos de desempenho, restritos a administradores
+class DiagnosticoViewSet(viewsets.ViewSet):
+    orcamento_consultas = {'destinatarios': 1, 'locks': 1}
+    permission_classes = [IsAdminUser]
+
+    # Acertos e faltas do cache de destinatários deste processo, para ajustar tamanho e TTL
+    @action(detail=False, methods=['get'])
+    def destinatarios(self, request):
+        return Response(cache_destinatarios.estatisticas())
+
+    # Carteiras com maior espera por lock na janela recente deste processo
+    @action(detail=False, methods=['get'])
+    def locks(self, request):
+        return Response(monitor_locks.relatorio())
@@ -0,0 +1,87 @@
+"""
+Aquecimento da aplicação antes de atender requisições.
+
+O processo mestre do servidor (ver setup/gunicorn.conf.py) chama
+aquecer_aplicacao() depois de carregar a aplicação e antes do fork, assim os
+workers herdam por copy-on-write o resolver de URLs compilado, as classes do
+DRF e do Simple JWT já importadas e os serializers já construídos uma vez.
+As conexões com o banco não podem ser compartilhadas entre processos: o mestre
+fecha as suas e cada worker abre as próprias com aquecer_conexoes().
+"""
+
+import inspect
+import time
+from django.db import connections
+from django.urls import NoReverseMatch, URLPattern, URLResolver, get_resolver, resolve, reverse
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+def _percorrer_padroes(padroes, prefixo=''):
+    """Gera (nome qualificado, padrão) de todas as rotas nomeadas, inclusive as de include()"""
+    for padrao in padroes:
+        if isinstance(padrao, URLResolver):
+            namespace = f'{prefixo}{padrao.namespace}:' if padrao.namespace else prefixo
+            yield from _percorrer_padroes(padrao.url_patterns, namespace)
+        elif isinstance(padrao, URLPattern) and padrao.name:
+            yield f'{prefixo}{padrao.name}', padrao
+
+
+def aquecer_rotas():
+    """Compila os regex de todas as rotas e resolve um caminho de exemplo de cada uma"""
+    resolver = get_resolver()
+    resolver.reverse_dict  # Popula as tabelas de reverse do resolver raiz
+    resolvidas = 0
+    for nome, padrao in _percorrer_padroes(resolver.url_patterns):
+        argumentos = {chave: '1' for chave in padrao.pattern.regex.groupindex}
+        try:
+            resolve(reverse(nome, kwargs=argumentos))
+        except NoReverseMatch:
+            continue  # Rotas com conversores específicos (ex.: sufixo de formato) são compiladas mesmo assim
+        resolvidas += 1
+    return resolvidas
+
+
+def aquecer_serializers():
+    """Instancia cada serializer do app e constrói seus campos"""
+    from carteira import serializers as modulo
+
+    construidos = 0
+    for _, classe in inspect.getmembers(modulo, inspect.isclass):
+        if issubclass(classe, serializers.BaseSerializer) and classe.__module__ == modulo.__name__:
+            classe().fields
+            construidos += 1
+    return construidos
+
+
+def aquecer_drf():
+    """Importa as classes configuradas do DRF e o backend de tokens, que são carregados sob demanda"""
+    for chave in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES',
+                  'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_FILTER_BACKENDS'):
+        getattr(api_settings, chave)
+    from rest_framework_simplejwt.state import token_backend  # noqa: F401
+
+
+def aquecer_conexoes():
+    """Abre e valida uma conexão por banco configurado; deve rodar no processo que vai usá-la"""
+    for conexao in connections.all():
+        conexao.ensure_connection()
+        with conexao.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def aquecer_aplicacao(abrir_conexoes=False):
+    """Executa todas as etapas de aquecimento e retorna o tempo gasto em cada uma, em ms"""
+    tempos = {}
+    etapas = [
+        ('rotas', aquecer_rotas),
+        ('serializers', aquecer_serializers),
+        ('drf', aquecer_drf),
+    ]
+    if abrir_conexoes:
+        etapas.append(('conexoes', aquecer_conexoes))
+    for nome, etapa in etapas:
+        inicio = time.perf_counter()
+        etapa()
+        tempos[nome] = (time.perf_counter() - inicio) * 1000
+    return tempos
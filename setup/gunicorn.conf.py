@@ -0,0 +1,53 @@
+"""
+Configuração do Gunicorn para produção.
+
+A aplicação é carregada e aquecida uma única vez no processo mestre
+(preload_app), antes do fork dos workers. Cada worker só abre a própria
+conexão com o banco, que é mantida entre requisições (CONN_MAX_AGE), e atende
+a primeira requisição já com a latência de regime.
+
+Com CARTEIRA_MOTOR=lote, os workers usam threads (gthread): o group commit só
+junta operações concorrentes dentro de um mesmo processo, e um worker síncrono
+atende uma requisição por vez, o que deixaria todo lote com uma única operação.
+Com CARTEIRA_MOTOR=livro_razao, o livro-razão precisa ser o único escritor dos
+saldos: sempre um único worker (GUNICORN_WORKERS é ignorado), com threads para
+atender requisições em paralelo e agrupar o msync do WAL.
+
+Uso:
+    gunicorn -c setup/gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+import decouple  # Importado como módulo: o Gunicorn interpreta um nome "config" neste arquivo como configuração
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "setup.settings_api")
+
+wsgi_app = "setup.wsgi:application"
+bind = decouple.config("GUNICORN_BIND", default="0.0.0.0:8000")
+workers = decouple.config("GUNICORN_WORKERS", default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+
+motor = decouple.config("CARTEIRA_MOTOR", default="")
+if motor in ("lote", "livro_razao"):
+    worker_class = "gthread"
+    threads = decouple.config("GUNICORN_THREADS", default=32, cast=int)  # Requisições que podem dividir um lote/msync
+if motor == "livro_razao":
+    workers = 1  # Um segundo processo recusaria o lock do diretório do WAL (ImproperlyConfigured)
+preload_app = True  # Importa e aquece a aplicação no mestre; os workers herdam tudo no fork
+
+
+def when_ready(server):
+    """Roda no mestre, com a aplicação já carregada e antes do primeiro fork"""
+    from django.db import connections
+    from setup.aquecimento import aquecer_aplicacao
+
+    tempos = aquecer_aplicacao(abrir_conexoes=False)
+    connections.close_all()  # Nenhum socket de banco pode ser herdado pelos workers
+    server.log.info("Aplicação aquecida: %s", ", ".join(f"{etapa} {ms:.1f} ms" for etapa, ms in tempos.items()))
+
+
+def post_fork(server, worker):
+    """Roda em cada worker logo após o fork: abre a conexão persistente do worker"""
+    from setup.aquecimento import aquecer_conexoes
+
+    aquecer_conexoes()
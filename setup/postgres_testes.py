@@ -0,0 +1,87 @@
+"""
+PostgreSQL descartável para os testes e os benchmarks.
+
+setup/test_settings.py chama iniciar_para_testes() para que o comando normal de
+testes (pytest ou manage.py test) use um PostgreSQL sempre que os binários
+estiverem disponíveis; benchmarks/bancos.py usa postgres_temporario() para
+comparar os bancos. O servidor é iniciado com initdb/pg_ctl em um diretório
+temporário, escuta só em um socket Unix dentro dele (sem rede) e aceita o
+usuário "carteira" sem senha. Quando não é possível iniciá-lo, PostgresIndisponivel
+traz o motivo (binários ausentes, execução como root, falha do initdb ou do
+pg_ctl) para quem for voltar ao SQLite.
+"""
+
+import atexit
+import glob
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from urllib.parse import quote
+
+
+class PostgresIndisponivel(Exception):
+    """Não foi possível iniciar o PostgreSQL descartável; a mensagem é o motivo"""
+
+
+def binarios_postgres():
+    """Diretório com initdb e pg_ctl (PG_BIN, PATH, pg_config --bindir ou /usr/lib/postgresql), ou None"""
+    candidatos = [os.environ.get('PG_BIN')]
+    if shutil.which('initdb'):
+        candidatos.append(os.path.dirname(shutil.which('initdb')))
+    if shutil.which('pg_config'):
+        processo = subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True)
+        candidatos.append(processo.stdout.strip())
+    candidatos += sorted(glob.glob('/usr/lib/postgresql/*/bin'), reverse=True)
+    for diretorio in filter(None, candidatos):
+        if all(os.path.exists(os.path.join(diretorio, programa)) for programa in ('initdb', 'pg_ctl')):
+            return diretorio
+    return None
+
+
+@contextmanager
+def postgres_temporario():
+    """
+    Inicia um PostgreSQL descartável e produz a URL de conexão; ao sair, para o servidor e remove o diretório.
+
+    Levanta PostgresIndisponivel, antes de produzir a URL, se o servidor não puder ser iniciado.
+    """
+    bindir = binarios_postgres()
+    if bindir is None:
+        raise PostgresIndisponivel("initdb/pg_ctl não encontrados (defina PG_BIN)")
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        raise PostgresIndisponivel("o initdb não pode ser executado como root")
+
+    diretorio = tempfile.mkdtemp(prefix='carteira-pg-')
+    dados = os.path.join(diretorio, 'dados')
+    pg_ctl = [os.path.join(bindir, 'pg_ctl'), '-D', dados]
+    iniciado = False
+    try:
+        processo = subprocess.run(
+            [os.path.join(bindir, 'initdb'), '-D', dados, '-U', 'carteira', '--auth=trust', '-E', 'UTF8'],
+            capture_output=True, text=True
+        )
+        if processo.returncode != 0:
+            raise PostgresIndisponivel(f"falha no initdb: {processo.stderr.strip()}")
+        processo = subprocess.run(
+            pg_ctl + ['-l', os.path.join(diretorio, 'postgres.log'), '-w', '-o',
+                      f"-c listen_addresses='' -c unix_socket_directories='{diretorio}'", 'start'],
+            capture_output=True, text=True
+        )
+        if processo.returncode != 0:
+            raise PostgresIndisponivel(f"falha ao iniciar o servidor: {processo.stderr.strip()}")
+        iniciado = True
+        yield f"postgres://carteira@{quote(diretorio, safe='')}/postgres"
+    finally:
+        if iniciado:
+            subprocess.run(pg_ctl + ['-m', 'fast', '-w', 'stop'], capture_output=True)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def iniciar_para_testes():
+    """Inicia o PostgreSQL descartável para o processo atual, parado ao final dele; retorna a URL"""
+    servidor = postgres_temporario()
+    url = servidor.__enter__()
+    atexit.register(servidor.__exit__, None, None, None)
+    return url
@@ -12,7 +12,6 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from decouple import config, Csv
-from dj_database_url import parse as db_url
 from datetime import timedelta
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +42,7 @@ DJANGO_APPS = [
 
 THIRD_PARTY_APPS = [
     "rest_framework",
+    "rest_framework_simplejwt.token_blacklist",  # Necessário para BLACKLIST_AFTER_ROTATION
     "django_filters",
 ]
 
@@ -53,6 +53,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "carteira.orcamento.OrcamentoConsultasMiddleware",  # Primeiro, para contar as consultas de todos os demais
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -95,6 +96,8 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', cast=int),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),  # Conexão persistente por worker, aberta no post_fork
+        'CONN_HEALTH_CHECKS': True,  # Descarta conexões persistentes quebradas antes de reutilizá-las
         'OPTIONS': {
         'sslmode': 'require',  # Necessário para conexões com o Render
         }
@@ -120,6 +123,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hash de senhas: PBKDF2-SHA256 do Django com custo configurável; hashes com outro custo são
+# regravados no próximo login. Os demais hashers só validam senhas antigas
+PASSWORD_HASHERS = [
+    "carteira.hashers.PBKDF2IteracoesConfiguraveis",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+SENHA_ITERACOES = config("SENHA_ITERACOES", default=870000, cast=int)  # Padrão do Django 5.1
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -155,6 +169,52 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 
     'JTI_CLAIM': 'jti',
+
+    # Refresh token com consulta à lista de revogação em cache e sem buscas repetidas do usuário
+    'TOKEN_OBTAIN_SERIALIZER': 'carteira.tokens.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'carteira.tokens.TokenRefreshSerializer',
+}
+
+# Outbox de eventos de transações (feed por cursor e relay)
+CARTEIRA_OUTBOX = {
+    'SINK': config('OUTBOX_SINK', default='carteira.outbox.ArquivoSink'),  # Classe que recebe os lotes do relay
+    'SINK_OPCOES': {'caminho': config('OUTBOX_ARQUIVO', default=str(BASE_DIR / 'eventos_outbox.ndjson'))},
+    'LONG_POLL_MAX': 25,  # Segundos máximos de espera no feed
+}
+
+# Motor das operações financeiras: vazio usa o banco diretamente (select_for_update)
+# "livro_razao" mantém os saldos em memória com WAL; exige um único processo atendendo as operações
+# "lote" junta as operações concorrentes de cada processo em uma única transação (group commit)
+CARTEIRA_MOTOR = config('CARTEIRA_MOTOR', default='')
+
+CARTEIRA_LOTE = {
+    'JANELA': 0.002,  # Segundos que o líder espera para juntar operações concorrentes
+    'TAMANHO_MAXIMO': 200,  # Operações por transação
+}
+
+# Orçamento de consultas SQL por endpoint, declarado em cada ViewSet (orcamento_consultas)
+CARTEIRA_ORCAMENTO = {
+    'ATIVO': config('ORCAMENTO_CONSULTAS', default=False, cast=bool),  # Conta as consultas e avisa no log ao exceder
+    'ESTRITO': False,  # Levanta OrcamentoExcedido em vez de avisar (usado nos testes)
+}
+
+# Cache em processo de username -> (usuario, carteira) dos destinatários de transferências
+CARTEIRA_DESTINATARIOS = {
+    'TAMANHO_MAXIMO': 1024,  # Entradas por processo (LRU)
+    'TTL': 300,  # Segundos; limita o atraso para renomeações feitas em outros processos
+}
+
+# Perfil de contenção de locks e de transações lentas (GET /api/diagnostico/locks/ e log "carteira.perfil")
+CARTEIRA_PERFIL = {
+    'JANELA': 300,  # Segundos de esperas considerados no ranking de carteiras disputadas
+    'TOP': 20,  # Carteiras no relatório
+    'LIMITE_TRANSACAO_LENTA': config('LIMITE_TRANSACAO_LENTA', default=0.5, cast=float),  # Segundos
+}
+
+CARTEIRA_LIVRO_RAZAO = {
+    'DIRETORIO': config('LIVRO_RAZAO_DIRETORIO', default=str(BASE_DIR / 'livro_razao')),
+    'TAMANHO_SEGMENTO': 64 * 1024 * 1024,  # Bytes por segmento do WAL (dois segmentos alternados)
+    'INTERVALO_DESCARGA': 0.05,  # Segundos entre as gravações em lote no banco
 }
 
 
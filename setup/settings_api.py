@@ -0,0 +1,43 @@
+"""
+Perfil "somente API" para os workers de produção.
+
+Parte de setup.settings e remove o que uma API JWT pura não usa: admin,
+sessões, mensagens, arquivos estáticos, templates e os middlewares que
+dependem deles. Menos apps e middlewares significam menos módulos importados
+e menos trabalho no boot de cada worker.
+
+Uso: DJANGO_SETTINGS_MODULE=setup.settings_api
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, REST_FRAMEWORK
+
+APPS_NAO_UTILIZADOS = [
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in APPS_NAO_UTILIZADOS]
+
+# Sem sessões e cookies a API não precisa de CSRF, mensagens nem do AuthenticationMiddleware:
+# a autenticação JWT é feita pelo DRF em cada view
+MIDDLEWARE = [
+    "carteira.orcamento.OrcamentoConsultasMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+# Nenhuma resposta é renderizada por templates
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',  # Sem a API navegável, que depende de templates e estáticos
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+    ],
+}
@@ -1,12 +1,31 @@
+import sys
+import dj_database_url
+from decouple import config
 from .settings import *
+from .postgres_testes import PostgresIndisponivel, iniciar_para_testes
 
-# Usa o SQLite em memória para testes
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
+# Banco dos testes, na ordem: TESTES_DATABASE_URL (ex.: o PostgreSQL descartável de benchmarks/bancos.py),
+# um PostgreSQL descartável iniciado para esta execução (com locks de linha reais) ou, se ele não puder ser
+# iniciado ou TESTES_POSTGRES=False, o SQLite em memória. O motivo da volta ao SQLite fica em
+# TESTES_POSTGRES_MOTIVO e aparece nos testes pulados de concorrência
+TESTES_POSTGRES_MOTIVO = ''
+if config('TESTES_DATABASE_URL', default=''):
+    DATABASES = {'default': dj_database_url.parse(config('TESTES_DATABASE_URL'))}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
     }
-}
+    if config('TESTES_POSTGRES', default=True, cast=bool):
+        try:
+            DATABASES = {'default': dj_database_url.parse(iniciar_para_testes())}
+        except PostgresIndisponivel as erro:
+            TESTES_POSTGRES_MOTIVO = f"PostgreSQL indisponível: {erro}"
+            print(f"{TESTES_POSTGRES_MOTIVO}; testes no SQLite em memória", file=sys.stderr)
+    else:
+        TESTES_POSTGRES_MOTIVO = "PostgreSQL desativado por TESTES_POSTGRES"
 
 # Desabilitado o debug para testes
 DEBUG = False
@@ -14,5 +33,11 @@ DEBUG = False
 # Chave secreta fixa para testes
 SECRET_KEY = 'test-key-not-for-production'
 
+# Hash de senha barato nos testes (o custo de produção é SENHA_ITERACOES em settings)
+SENHA_ITERACOES = 1000
+
 # Permitir todos os hosts em testes
-ALLOWED_HOSTS = ['*']
\ No newline at end of file
+ALLOWED_HOSTS = ['*']
+
+# Toda requisição dos testes falha se passar do orçamento de consultas do endpoint
+CARTEIRA_ORCAMENTO = {'ATIVO': True, 'ESTRITO': True}